@@ -0,0 +1,116 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+# Cache hasil OCR berbasis konten: kunci dibentuk dari hash isi PDF/halaman dan parameter OCR,
+# sehingga file yang diunggah ulang atau hanya berubah beberapa halaman tidak perlu di-OCR ulang
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "/OCR/cache_ocr")
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))  # 0 = cache dimatikan
+
+# Fungsi untuk menghitung hash SHA-256 sebuah file secara bertahap
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _settings_digest(settings):
+    return json.dumps(settings, sort_keys=True).encode()
+
+# Kunci cache untuk seluruh dokumen
+def document_key(pdf_hash, settings):
+    return hashlib.sha256(b"document:" + pdf_hash.encode() + _settings_digest(settings)).hexdigest()
+
+# Kunci cache untuk satu halaman, dihitung dari piksel halaman hasil rasterisasi
+def page_key(image, settings):
+    digest = hashlib.sha256(b"page:" + _settings_digest(settings))
+    digest.update(str(image.shape).encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+# Cache berbasis file JSON di disk dengan eviction LRU berdasarkan total ukuran.
+# Waktu akses disimpan sebagai mtime file sehingga bisa dipakai bersama oleh beberapa proses worker.
+class OCRCache:
+    def __init__(self, directory=OCR_CACHE_DIR, max_bytes=OCR_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = max_bytes > 0
+        self.counters = {"document_hits": 0, "document_misses": 0, "page_hits": 0, "page_misses": 0}
+        self.lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)  # Tandai sebagai baru diakses untuk LRU
+            return value
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def record(self, kind, hit):
+        with self.lock:
+            self.counters[f"{kind}_{'hits' if hit else 'misses'}"] += 1
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    # Menghapus entry yang paling lama tidak diakses sampai total ukuran cache di bawah batas
+    def evict(self):
+        if not self.enabled:
+            return 0
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            logging.info(f"{removed} entry cache OCR dihapus, ukuran cache sekarang {total} byte")
+        return removed
+
+    def stats(self):
+        entries = self._entries() if self.enabled else []
+        with self.lock:
+            counters = dict(self.counters)
+        for kind in ("document", "page"):
+            lookups = counters[f"{kind}_hits"] + counters[f"{kind}_misses"]
+            counters[f"{kind}_hit_rate"] = round(counters[f"{kind}_hits"] / lookups, 4) if lookups else None
+        return {"enabled": self.enabled, "entries": len(entries), "size_bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes, **counters}
+
+ocr_cache = OCRCache()
@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from app.ocr import perform_ocr, OCRCancelled
+from rag_common.metrics import request_id_var
+from rag_common.models import cuda_memory_reserved_mb
+
+# Konfigurasi antrean job OCR (bisa diubah lewat environment variable)
+OCR_MAX_CONCURRENT_JOBS = int(os.getenv("OCR_MAX_CONCURRENT_JOBS", "1"))  # Jumlah job OCR yang berjalan bersamaan
+OCR_MAX_QUEUED_JOBS = int(os.getenv("OCR_MAX_QUEUED_JOBS", "50"))  # Jumlah maksimal job yang menunggu di antrean
+OCR_JOB_RETENTION = int(os.getenv("OCR_JOB_RETENTION", "86400"))  # Lama (detik) status job selesai disimpan
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Exception ketika antrean job sudah penuh
+class QueueFull(Exception):
+    pass
+
+# Menyimpan status dan progress satu job OCR
+class OCRJob:
+    def __init__(self, filename, pdf_path, output_file, pdf_hash=None):
+        self.id = uuid.uuid4().hex
+        self.request_id = request_id_var.get()  # Request upload yang membuat job, untuk korelasi log
+        self.filename = filename
+        self.pdf_path = pdf_path
+        self.pdf_hash = pdf_hash
+        self.output_file = output_file
+        self.status = QUEUED
+        self.pages_done = 0
+        self.total_pages = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.reserved_memory = None
+        self.page_sources = None
+        self.cached_document = False
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    def update_progress(self, pages_done, total_pages):
+        self.pages_done = pages_done
+        self.total_pages = total_pages
+
+    def to_dict(self):
+        elapsed_time = None
+        if self.started_at:
+            elapsed_time = round((self.finished_at or time.time()) - self.started_at, 2)
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "pages_done": self.pages_done,
+            "total_pages": self.total_pages,
+            "output_file": self.output_file if self.status == DONE else None,
+            "page_sources": self.page_sources,
+            "cached_document": self.cached_document,
+            "error": self.error,
+            "elapsed_time": elapsed_time,
+            "reserved_memory_mb": self.reserved_memory,
+        }
+
+# Mengelola antrean job OCR dengan jumlah worker dan panjang antrean yang terbatas
+class JobManager:
+    def __init__(self, max_workers=OCR_MAX_CONCURRENT_JOBS, max_queued=OCR_MAX_QUEUED_JOBS,
+                 retention=OCR_JOB_RETENTION):
+        self.max_queued = max_queued
+        self.retention = retention
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocr-job")
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, filename, pdf_path, output_file, pdf_hash=None):
+        with self.lock:
+            self._prune()
+            queued = sum(1 for job in self.jobs.values() if job.status == QUEUED)
+            if queued >= self.max_queued:
+                raise QueueFull(f"Antrean OCR penuh ({queued} job menunggu)")
+            job = OCRJob(filename, pdf_path, output_file, pdf_hash)
+            self.jobs[job.id] = job
+            job.future = self.executor.submit(self._run, job)
+        logging.info(f"Job OCR {job.id} untuk {filename} masuk antrean.")
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self):
+        return [job.to_dict() for job in list(self.jobs.values())]
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        with self.lock:
+            if job.status == QUEUED and job.future.cancel():
+                # Job belum sempat berjalan, langsung tandai batal
+                self._finish(job, CANCELLED)
+            elif job.status in (QUEUED, RUNNING):
+                job.cancel_event.set()
+        return job
+
+    def shutdown(self):
+        for job in list(self.jobs.values()):
+            job.cancel_event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job):
+        token = request_id_var.set(job.request_id)
+        try:
+            self._run_job(job)
+        finally:
+            request_id_var.reset(token)
+
+    def _run_job(self, job):
+        if job.cancel_event.is_set():
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            summary = perform_ocr(job.pdf_path, job.output_file, progress=job.update_progress,
+                                  cancel_event=job.cancel_event, pdf_hash=job.pdf_hash)
+            job.output_file = summary["output_file"]
+            job.page_sources = summary["page_sources"]
+            job.cached_document = summary["cached_document"]
+            job.reserved_memory = cuda_memory_reserved_mb()
+            self._finish(job, DONE)
+        except OCRCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            logging.error(f"Job OCR {job.id} gagal: {e}")
+            job.error = str(e)
+            self._finish(job, FAILED)
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = time.time()
+        if os.path.exists(job.pdf_path):
+            os.remove(job.pdf_path)
+        logging.info(f"Job OCR {job.id} selesai dengan status {status}.")
+
+    # Menghapus status job lama yang sudah selesai agar memori tidak terus bertambah
+    def _prune(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished_at and now - job.finished_at > self.retention]
+        for job_id in expired:
+            del self.jobs[job_id]
@@ -0,0 +1,91 @@
+import cv2
+import numpy as np
+
+# Analisis layout halaman: mencari area paragraf dan menyimpannya sebagai array NumPy (N, 4) berisi x, y, w, h
+
+# Ukuran blok untuk perbandingan containment, membatasi memori matriks boolean menjadi BLOCK x N
+NESTED_BLOCK_SIZE = 1024
+
+# Ukuran kernel dilate/erode (horizontal, vertikal) untuk menyatukan baris menjadi paragraf
+LAYOUT_KERNEL = (50, 41) # sebelumnya (50,30)
+
+# Fungsi untuk menghitung bounding box semua kontur sekaligus (setara cv2.boundingRect per kontur)
+def bounding_boxes(cnts):
+    if len(cnts) == 0:
+        return np.empty((0, 4), dtype=np.int64)
+    lengths = np.fromiter((len(c) for c in cnts), dtype=np.int64, count=len(cnts))
+    points = np.concatenate([c.reshape(-1, 2) for c in cnts]).astype(np.int64)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    mins = np.minimum.reduceat(points, starts, axis=0)
+    maxs = np.maximum.reduceat(points, starts, axis=0)
+    return np.column_stack((mins, maxs - mins + 1))
+
+# Mengelompokkan box yang berdekatan secara vertikal dan bertinggi mirip, lalu menggabungkannya
+def group_and_merge(boxes, min_height=50, max_height=1540, min_width=10, max_height_diff=100):
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    # Urutkan berdasarkan y (stable, sama seperti sorted() sebelumnya) lalu buang box yang terlalu kecil/besar
+    boxes = boxes[np.argsort(boxes[:, 1], kind="stable")]
+    h = boxes[:, 3]
+    boxes = boxes[(h < max_height) & (h > min_height) & (boxes[:, 2] > min_width)]
+    if len(boxes) == 0:
+        return boxes
+
+    # Grup baru dimulai jika jarak y ke box sebelumnya > h/2 atau selisih tingginya > max_height_diff
+    y, h = boxes[:, 1], boxes[:, 3]
+    breaks = (np.abs(np.diff(y)) > h[1:] / 2) | (np.abs(np.diff(h)) > max_height_diff)
+    starts = np.concatenate(([0], np.flatnonzero(breaks) + 1))
+    group_ids = np.cumsum(np.concatenate(([False], breaks)))
+
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    gx1, gy1 = np.minimum.reduceat(x1, starts), np.minimum.reduceat(y1, starts)
+    gx2, gy2 = np.maximum.reduceat(x2, starts), np.maximum.reduceat(y2, starts)
+    mergeable = np.maximum.reduceat(h, starts) - np.minimum.reduceat(h, starts) <= max_height_diff
+    merged = np.column_stack((gx1, gy1, gx2 - gx1, gy2 - gy1))
+
+    # Grup yang bisa digabung diwakili satu box gabungan, grup lainnya tetap berisi box aslinya
+    out = boxes.copy()
+    is_start = np.zeros(len(boxes), dtype=bool)
+    is_start[starts] = True
+    keep = is_start | ~mergeable[group_ids]
+    replace = is_start & mergeable[group_ids]
+    out[replace] = merged[group_ids[replace]]
+    return out[keep]
+
+# Menghapus bounding box yang lebih kecil jika berada di dalam bounding box yang lebih besar
+def remove_nested_boxes(boxes, block_size=NESTED_BLOCK_SIZE):
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    n = len(boxes)
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    nested = np.zeros(n, dtype=bool)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        inside = ((x1[start:stop, None] >= x1) & (y1[start:stop, None] >= y1)
+                  & (x2[start:stop, None] <= x2) & (y2[start:stop, None] <= y2))
+        # Box tidak dihitung berada di dalam dirinya sendiri
+        inside[np.arange(stop - start), np.arange(start, stop)] = False
+        nested[start:stop] = inside.any(axis=1)
+    return boxes[~nested]
+
+# Ukuran kernel dalam piksel untuk gambar dengan skala tertentu (relatif terhadap halaman 300 dpi)
+def _scaled(value, scale, minimum=1):
+    return max(minimum, int(round(value * scale)))
+
+# Fungsi untuk mendeteksi area paragraf pada satu halaman dengan operasi morfologi OpenCV.
+# scale adalah ukuran gambar relatif terhadap halaman 300 dpi, semua parameter piksel ikut disesuaikan.
+def detect_text_boxes(image, scale=1.0):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    block_size = _scaled(11, scale, 3) | 1  # blockSize adaptiveThreshold harus ganjil
+    thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, block_size, 2)
+
+    kernal = cv2.getStructuringElement(cv2.MORPH_RECT, (_scaled(LAYOUT_KERNEL[0], scale), _scaled(LAYOUT_KERNEL[1], scale)))
+    dilate = cv2.dilate(thresh, kernal, iterations=1)
+    erosion = cv2.erode(dilate, kernal, iterations=1)
+
+    cnts = cv2.findContours(erosion, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_TC89_L1)
+    cnts = cnts[0] if len(cnts) == 2 else cnts[1]
+
+    boxes = group_and_merge(bounding_boxes(cnts), min_height=50 * scale, max_height=1540 * scale,
+                            min_width=10 * scale, max_height_diff=100 * scale)
+    return remove_nested_boxes(boxes)
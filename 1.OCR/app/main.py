@@ -1,12 +1,26 @@
 from fastapi import FastAPI, UploadFile, File
 from fastapi.responses import JSONResponse
-from app.ocr import perform_ocr
+from app.jobs import JobManager, QueueFull, DONE
+from app.cache import ocr_cache
+from app.upload import save_upload, UploadTooLarge
+from app.ocr import MODEL_NAMES, warmup
+from rag_common.metrics import instrument_app
+from rag_common.models import registry
 import os
 import uvicorn
-import torch
 from datetime import datetime, timedelta
 
 app = FastAPI()
+instrument_app(app)
+job_manager = JobManager()
+
+@app.on_event("startup")
+def warmup_models():
+    warmup()
+
+@app.on_event("shutdown")
+def shutdown_jobs():
+    job_manager.shutdown()
 
 @app.get("/")
 def read_root():
@@ -14,7 +28,6 @@ def read_root():
 
 @app.post("/upload-pdf/")
 async def upload_pdf(file: UploadFile = File(...)):
-    file_location = f"temp_{file.filename}"
     output_folder = '/OCR/result_ocr'
     
     # Manipulasi nama file sesuai dengan aturan yang diinginkan
@@ -29,25 +42,60 @@ async def upload_pdf(file: UploadFile = File(...)):
     # Pastikan folder output ada, jika tidak, buat foldernya
     os.makedirs(output_folder, exist_ok=True)
     
-    with open(file_location, "wb+") as file_object:
-        file_object.write(file.file.read())
+    # Upload disimpan per potongan ke file sementara yang unik, hash PDF dihitung sekaligus
+    try:
+        file_location, pdf_hash, _ = await save_upload(file)
+    except UploadTooLarge as e:
+        return JSONResponse(content={"error": str(e)}, status_code=413)
     
+    # OCR dijalankan di worker pool, request langsung mengembalikan job id
     try:
-        start_time = datetime.now()
-        
-        perform_ocr(file_location, output_file)
+        job = job_manager.submit(file.filename, file_location, output_file, pdf_hash)
+    except QueueFull as e:
         os.remove(file_location)
-        
-        end_time = datetime.now()
-        elapsed_time = (end_time - start_time).total_seconds()
-        reserved_memory = torch.cuda.memory_reserved(0) / (1024 ** 2)  # Konversi ke MB
-        return JSONResponse(content={"message": "OCR berhasil dilakukan", "output_file": output_file, 
-                                      "waktu": f"OCR berhasil dilakukan dalam {elapsed_time:.2f} detik",
-                                      "reserved memory":f"Memory yang digunakan {reserved_memory} MB"})
+        return JSONResponse(content={"error": str(e)}, status_code=429)
 
-    except Exception as e:
-        os.remove(file_location)
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+    return JSONResponse(content={"message": "File berhasil diunggah, OCR sedang diproses", "job_id": job.id,
+                                 "status_url": f"/jobs/{job.id}"}, status_code=202)
+
+@app.get("/jobs/")
+def list_jobs():
+    return JSONResponse(content={"jobs": job_manager.list()})
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job tidak ditemukan"}, status_code=404)
+    return JSONResponse(content=job.to_dict())
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job tidak ditemukan"}, status_code=404)
+    return JSONResponse(content=job.to_dict())
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job tidak ditemukan"}, status_code=404)
+    if job.status != DONE:
+        return JSONResponse(content={"error": f"Hasil belum tersedia, status job: {job.status}"}, status_code=409)
+
+    with open(job.output_file, "r") as file:
+        content = file.read()
+    return JSONResponse(content={"output_file": job.output_file, "content": content})
+
+@app.get("/health")
+def health():
+    status = registry.status(MODEL_NAMES)
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
+
+@app.get("/cache-stats/")
+def cache_stats():
+    return JSONResponse(content=ocr_cache.stats())
 
 @app.get("/list-ocr-results/")
 def list_ocr_results():
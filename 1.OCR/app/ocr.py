@@ -1,132 +1,357 @@
 import logging
+import multiprocessing
+import os
+import tempfile
+import threading
 import time
 import re
-import easyocr
-import cv2
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 import numpy as np
-from pdf2image import convert_from_path
-import torch
+from PIL import Image
+from pdf2image import convert_from_path, pdfinfo_from_path
+from app.layout import LAYOUT_KERNEL
+from app.preprocess import (OCR_ADAPTIVE_DPI, OCR_DPI, OCR_MAX_DPI, OCR_MIN_DPI, OCR_PROBE_DPI,
+                            OCR_TARGET_TEXT_HEIGHT, OCR_LAYOUT_SCALE, choose_dpis, find_text_boxes)
+from app.cache import ocr_cache, document_key, page_key, file_sha256
+from app.textlayer import OCR_TEXT_LAYER, OCR_TEXT_LAYER_MIN_CHARS, OCR_TEXT_LAYER_MIN_QUALITY, text_layer_pages
 import psutil
+from rag_common.chunking import PAGE_SEPARATOR
+from rag_common.metrics import capture_spans, configure_logging, metrics, record, record_spans, span
+from rag_common.models import registry
 
-# Konfigurasi logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
-reader = easyocr.Reader(['en'], gpu='cuda:0')
-
-def perform_ocr(pdf_path: str, output_path: str) -> None:
-    # Function to check if a box (inner) is inside another box (outer)
-    def is_inside(inner, outer):
-        x1, y1, w1, h1 = inner
-        x2, y2, w2, h2 = outer
-        return x1 >= x2 and y1 >= y2 and x1 + w1 <= x2 + w2 and y1 + h1 <= y2 + h2
-
-    # Menghapus bounding box yang lebih kecil jika berada di dalam bounding box yang lebih besar
-    def remove_nested_boxes(boxes):
-        filtered_boxes = []
-        for i in range(len(boxes)):
-            is_nested = False
-            for j in range(len(boxes)):
-                if i != j and is_inside(boxes[i], boxes[j]):
-                    is_nested = True
-                    break
-            if not is_nested:
-                filtered_boxes.append(boxes[i])
-        return filtered_boxes
-    
-    logging.info("Memulai eksekusi OCR.")
-    start_time = time.time()
-    
-    # Convert PDF to images
-    try:
-        images = convert_from_path(pdf_path, dpi=300)
-        logging.info(f"Konversi PDF ke gambar berhasil, total halaman: {len(images)}")
-    except Exception as e:
-        logging.error(f"Error saat mengkonversi PDF ke gambar: {e}")
-        raise e
+# Konfigurasi logging (level lewat LOG_LEVEL, default INFO)
+configure_logging()
+
+# Konfigurasi pipeline OCR (bisa diubah lewat environment variable)
+OCR_LANGUAGES = os.getenv("OCR_LANGUAGES", "en").split(",")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "1"))  # Jumlah proses worker, 1 = tanpa process pool
+OCR_PAGE_WINDOW = int(os.getenv("OCR_PAGE_WINDOW", "4"))  # Jumlah halaman yang dirasterisasi sekaligus
+OCR_RECOGNITION = os.getenv("OCR_RECOGNITION", "batched")  # "batched" atau "single" (satu readtext per ROI)
+OCR_BATCH_SIZE = int(os.getenv("OCR_BATCH_SIZE", "16"))  # Ukuran batch recognizer EasyOCR
+OCR_BUCKET_SIZE = int(os.getenv("OCR_BUCKET_SIZE", "8"))  # Maksimal ROI dalam satu bucket ukuran
+OCR_MAX_PADDING = float(os.getenv("OCR_MAX_PADDING", "0.5"))  # Batas proporsi area padding dalam satu bucket
+
+# Parameter yang memengaruhi hasil OCR, dipakai sebagai bagian dari kunci cache
+OCR_SETTINGS = {"dpi": OCR_DPI, "kernel": list(LAYOUT_KERNEL), "languages": OCR_LANGUAGES,
+                "recognition": OCR_RECOGNITION, "batch_size": OCR_BATCH_SIZE, "bucket_size": OCR_BUCKET_SIZE,
+                "max_padding": OCR_MAX_PADDING, "adaptive_dpi": OCR_ADAPTIVE_DPI, "min_dpi": OCR_MIN_DPI,
+                "max_dpi": OCR_MAX_DPI,
+                "probe_dpi": OCR_PROBE_DPI, "target_text_height": OCR_TARGET_TEXT_HEIGHT,
+                "layout_scale": OCR_LAYOUT_SCALE, "text_layer": OCR_TEXT_LAYER,
+                "text_layer_min_chars": OCR_TEXT_LAYER_MIN_CHARS, "text_layer_min_quality": OCR_TEXT_LAYER_MIN_QUALITY}
+
+# Sumber teks per halaman, dilaporkan per dokumen
+TEXT_LAYER = "text_layer"
+OCR = "ocr"
+CACHE = "cache"
+
+OCR_PAGES = metrics.counter("rag_ocr_pages_total", "Halaman yang diproses menurut sumber teks", ("source",))
+
+OCR_QUANTIZE = os.getenv("OCR_QUANTIZE", "1") == "1"  # Kuantisasi model EasyOCR saat berjalan di CPU
+
+# Model EasyOCR dimuat saat pertama kali dipakai (atau lewat warm-up), device jatuh ke CPU jika tidak ada GPU
+def load_reader(device):
+    import easyocr
+    gpu = device if device.startswith("cuda") else False
+    return easyocr.Reader(OCR_LANGUAGES, gpu=gpu, quantize=OCR_QUANTIZE)
+
+registry.register("easyocr", load_reader)
 
-    ocr_results_all = []
+# Model yang harus siap di proses utama. Jika memakai process pool, model dimuat oleh masing-masing worker.
+MODEL_NAMES = ["easyocr"] if OCR_WORKERS <= 1 else []
 
-    for i, img in enumerate(images):
-        logging.info(f"Memproses halaman {i+1}")
+_pool = None
+_pool_lock = threading.Lock()
+
+# Exception ketika proses OCR dibatalkan lewat cancel_event
+class OCRCancelled(Exception):
+    pass
+
+# Mengelompokkan ROI berdasarkan ukuran agar padding yang dibutuhkan dalam satu bucket tetap kecil
+def bucket_rois(rois, bucket_size=OCR_BUCKET_SIZE, max_padding=OCR_MAX_PADDING):
+    order = sorted(range(len(rois)), key=lambda i: rois[i].shape[:2])
+    buckets = []
+    current, bucket_h, bucket_w, area = [], 0, 0, 0
+    for i in order:
+        h, w = rois[i].shape[:2]
+        new_h, new_w = max(bucket_h, h), max(bucket_w, w)
+        padded_area = new_h * new_w * (len(current) + 1)
+        if current and (len(current) >= bucket_size or area + h * w < padded_area * (1 - max_padding)):
+            buckets.append(current)
+            current, new_h, new_w, area = [], h, w, 0
+        current.append(i)
+        bucket_h, bucket_w, area = new_h, new_w, area + h * w
+    if current:
+        buckets.append(current)
+    return buckets
+
+# Menambahkan padding putih di kanan/bawah agar semua ROI dalam bucket berukuran sama
+def _pad_rois(rois, height, width):
+    padded = []
+    for roi in rois:
+        canvas = np.full((height, width) + roi.shape[2:], 255, dtype=roi.dtype)
+        canvas[:roi.shape[0], :roi.shape[1]] = roi
+        padded.append(canvas)
+    return padded
+
+# Mengenali teks dari semua ROI pada satu halaman, hasil dikembalikan sesuai urutan ROI
+def recognize_rois(rois, mode=None):
+    mode = mode or OCR_RECOGNITION
+    reader = registry.get("easyocr")
+    if mode == "single":
+        return [' '.join([item[1] for item in reader.readtext(roi)]) for roi in rois]
+
+    texts = [''] * len(rois)
+    for bucket in bucket_rois(rois):
+        height = max(rois[i].shape[0] for i in bucket)
+        width = max(rois[i].shape[1] for i in bucket)
+        results = reader.readtext_batched(_pad_rois([rois[i] for i in bucket], height, width),
+                                          batch_size=OCR_BATCH_SIZE)
+        for i, ocr_result in zip(bucket, results):
+            texts[i] = ' '.join([item[1] for item in ocr_result])
+    return texts
+
+# Fungsi untuk menjalankan analisis layout dan OCR pada satu halaman
+def ocr_page(image, dpi=OCR_DPI, recognition=None):
+    with span("layout"):
+        filtered_rois = find_text_boxes(image, dpi).tolist()
+    rois = [image[y:y+h, x:x+w] for x, y, w, h in filtered_rois]
+    recognition_start = time.perf_counter()
+    texts = recognize_rois(rois, recognition)
+    recognition_seconds = time.perf_counter() - recognition_start
+    record("recognize", recognition_seconds)
+    logging.debug(f"{len(rois)} ROI dikenali dalam {recognition_seconds:.2f} detik ({recognition or OCR_RECOGNITION})")
+
+    ocr_results = []
+    for ocr_text in texts:
+        if len(ocr_text) > 10 and ocr_text.count('\n\n') < 5 and ocr_text.count('|') <= 1:
+            ocr_text = re.sub(r'\s+', ' ', ocr_text)
+            ocr_text = ocr_text.replace('_', '.')
+            #ocr_text = re.sub(r'(?<!\n)(\d+\.\s+[A-Z])', r'\n\1', ocr_text)
+            #ocr_text = re.sub(r'(\s\d+\)\s[A-Z])', r'\n\n\1', ocr_text)
+            #ocr_text = re.sub(r'(\s[a-zA-Z]\.\s[A-Z])', r'\n\n\1', ocr_text)
+            #ocr_text = re.sub(r'(\s\d+\.\s[A-Z])', r'\n\n\1', ocr_text)
+            ocr_text = re.sub(r'\n{3,}', '', ocr_text)
+            ocr_results.append(ocr_text)
+
+    return ocr_results
+
+# OCR satu halaman dengan memakai cache per halaman, mengembalikan (teks, sumber)
+def _ocr_page_cached(image, dpi):
+    key = page_key(image, OCR_SETTINGS)
+    ocr_results = ocr_cache.get(key)
+    if ocr_results is not None:
+        return ocr_results, CACHE
+    ocr_results = ocr_page(image, dpi)
+    ocr_cache.put(key, ocr_results)
+    return ocr_results, OCR
+
+# Fungsi yang dijalankan oleh worker: membaca halaman hasil rasterisasi dari disk lalu melakukan OCR.
+# Span waktu dikembalikan bersama hasil karena metrik proses worker tidak terbaca dari /metrics.
+def _ocr_page_file(image_path, dpi):
+    with capture_spans() as spans:
         try:
-            image = np.array(img)
-            base_image = image.copy()
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            blur = cv2.GaussianBlur(gray, (99, 99), 0)
-            thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2)
-            #thresh = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
-
-            kernal = cv2.getStructuringElement(cv2.MORPH_RECT, (50, 41)) # sebelumnya (50,30) (horizontal, vertikal)
-            dilate = cv2.dilate(thresh, kernal, iterations=1)
-            erosion = cv2.erode(dilate, kernal, iterations=1)
-
-            cnts = cv2.findContours(erosion, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_TC89_L1)
-            cnts = cnts[0] if len(cnts) == 2 else cnts[1]
-            cnts = sorted(cnts, key=lambda x: cv2.boundingRect(x)[1])
-
-            grouped_rois = []
-            current_group = []
-
-            for c in cnts:
-                x, y, w, h = cv2.boundingRect(c)
-                if not (1540 > h > 50 and w > 10):
-                    continue
-                if current_group and abs(y - current_group[-1][1]) > h / 2:
-                    grouped_rois.append(current_group)
-                    current_group = []
-                if not current_group or abs(current_group[-1][3] - h) <= 100:
-                    current_group.append((x, y, w, h))
-                else:
-                    grouped_rois.append(current_group)
-                    current_group = [(x, y, w, h)]
+            with Image.open(image_path) as img:
+                image = np.array(img)
+        finally:
+            os.remove(image_path)
+        result = _ocr_page_cached(image, dpi)
+    return result, spans
+
+# Hasil halaman dari worker: span dari proses worker dicatat di proses utama
+def _worker_result(future):
+    result, spans = future.result()
+    record_spans(spans)
+    return result
 
-            if current_group:
-                grouped_rois.append(current_group)
+# Process pool dibuat sekali dan dipakai ulang agar model EasyOCR tidak dimuat ulang setiap dokumen
+def _get_pool(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn dipakai karena fork setelah CUDA diinisialisasi tidak aman
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
 
-            merged_rois = []
-            for group in grouped_rois:
-                if len(group) == 1:
-                    merged_rois.append(group[0])
+# Warm-up model saat startup
+def warmup():
+    registry.warmup_in_background(MODEL_NAMES)
+
+# Menghitung jumlah halaman PDF tanpa merasterisasi halaman
+def count_pages(pdf_path):
+    return pdfinfo_from_path(pdf_path)["Pages"]
+
+# Membagi daftar nomor halaman menjadi rentang halaman yang berurutan
+def _page_runs(page_numbers):
+    runs = []
+    for page_number in page_numbers:
+        if runs and runs[-1][1] == page_number - 1:
+            runs[-1][1] = page_number
+        else:
+            runs.append([page_number, page_number])
+    return runs
+
+# Merasterisasi PDF secara bertahap per jendela halaman (first_page/last_page).
+# DPI dipilih per halaman; halaman berurutan dengan DPI yang sama dirasterisasi dalam satu panggilan.
+# page_numbers membatasi halaman yang dirasterisasi (default semua halaman).
+def iter_pages(pdf_path, dpi=OCR_DPI, page_window=OCR_PAGE_WINDOW, output_folder=None, total_pages=None,
+               page_numbers=None):
+    if page_numbers is None:
+        page_numbers = range(1, (total_pages or count_pages(pdf_path)) + 1)
+    page_numbers = list(page_numbers)
+    for window_start in range(0, len(page_numbers), page_window):
+        for first_page, last_page in _page_runs(page_numbers[window_start:window_start + page_window]):
+            with span("dpi_probe"):
+                dpis = choose_dpis(pdf_path, first_page, last_page, dpi)
+            run_start = first_page
+            while run_start <= last_page:
+                run_dpi = dpis[run_start - first_page]
+                run_end = run_start
+                while run_end < last_page and dpis[run_end + 1 - first_page] == run_dpi:
+                    run_end += 1
+                rasterize_start = time.perf_counter()
+                pages = convert_from_path(pdf_path, dpi=run_dpi, first_page=run_start, last_page=run_end,
+                                          output_folder=output_folder, paths_only=output_folder is not None)
+                # Satu panggilan merasterisasi beberapa halaman, durasi dicatat rata-rata per halaman
+                page_seconds = (time.perf_counter() - rasterize_start) / max(len(pages), 1)
+                for page_number, page in enumerate(pages, start=run_start):
+                    record("rasterize", page_seconds)
+                    yield page_number, page, run_dpi
+                run_start = run_end + 1
+
+# Menghasilkan (nomor_halaman, sumber, teks/gambar) per jendela halaman secara berurutan.
+# Halaman dengan text layer yang layak langsung memakai teks tersebut, sisanya dirasterisasi untuk OCR.
+def _iter_window_pages(pdf_path, dpi, page_window, total_pages, output_folder=None):
+    for first_page in range(1, total_pages + 1, page_window):
+        last_page = min(first_page + page_window - 1, total_pages)
+        with span("text_layer"):
+            text_pages = text_layer_pages(pdf_path, first_page, last_page)
+        scanned = [p for p in range(first_page, last_page + 1) if p not in text_pages]
+        images = iter_pages(pdf_path, dpi, page_window, output_folder, page_numbers=scanned)
+        for page_number in range(first_page, last_page + 1):
+            if page_number in text_pages:
+                yield page_number, TEXT_LAYER, text_pages[page_number]
+            else:
+                _, page, page_dpi = next(images)
+                yield page_number, OCR, (page, page_dpi)
+
+# Menjalankan OCR per halaman dan menghasilkan (teks, sumber) secara berurutan sesuai nomor halaman
+def _iter_page_results(pdf_path, dpi, workers, page_window, total_pages):
+    if workers <= 1:
+        for page_number, source, payload in _iter_window_pages(pdf_path, dpi, page_window, total_pages):
+            if source == TEXT_LAYER:
+                yield page_number, (payload, TEXT_LAYER)
+                continue
+            img, page_dpi = payload
+            logging.info(f"Memproses halaman {page_number} ({page_dpi} dpi)")
+            yield page_number, _ocr_page_cached(np.array(img), page_dpi)
+        return
+
+    pool = _get_pool(workers)
+    max_in_flight = max(workers, page_window)
+    pending = deque()
+    with tempfile.TemporaryDirectory(prefix="ocr_pages_") as page_folder:
+        try:
+            for page_number, source, payload in _iter_window_pages(pdf_path, dpi, page_window, total_pages, page_folder):
+                if source == TEXT_LAYER:
+                    future = Future()
+                    future.set_result(((payload, TEXT_LAYER), []))
                 else:
-                    heights = [h for x, y, w, h in group]
-                    if max(heights) - min(heights) <= 100:
-                        x_min = min([x for x, y, w, h in group])
-                        y_min = min([y for x, y, w, h in group])
-                        x_max = max([x + w for x, y, w, h in group])
-                        y_max = max([y + h for x, y, w, h in group])
-                        merged_rois.append((x_min, y_min, x_max - x_min, y_max - y_min))
-                    else:
-                        merged_rois.extend(group)
-            
-            filtered_rois = remove_nested_boxes(merged_rois)
-
-            for x, y, w, h in filtered_rois:
-                cv2.rectangle(image, (x-5, y-5), (x+w+5, y+h+5), (36, 255, 12), 2)
-
-            for x, y, w, h in filtered_rois:
-                roi = base_image[y:y+h, x:x+w]
-                ocr_result = reader.readtext(roi)
-                ocr_text = ' '.join([item[1] for item in ocr_result])
-                if len(ocr_text) > 10 and ocr_text.count('\n\n') < 5 and ocr_text.count('|') <= 1:
-                    ocr_text = re.sub(r'\s+', ' ', ocr_text)
-                    ocr_text = ocr_text.replace('_', '.')
-                    #ocr_text = re.sub(r'(?<!\n)(\d+\.\s+[A-Z])', r'\n\1', ocr_text)
-                    #ocr_text = re.sub(r'(\s\d+\)\s[A-Z])', r'\n\n\1', ocr_text)
-                    #ocr_text = re.sub(r'(\s[a-zA-Z]\.\s[A-Z])', r'\n\n\1', ocr_text)
-                    #ocr_text = re.sub(r'(\s\d+\.\s[A-Z])', r'\n\n\1', ocr_text)
-                    ocr_text = re.sub(r'\n{3,}', '', ocr_text)
-                    ocr_results_all.append(ocr_text)
-
-            logging.info(f"OCR halaman {i+1} selesai.")
-
-        except Exception as e:
-            logging.error(f"Error saat memproses halaman {i+1}: {e}")
-            raise e
+                    image_path, page_dpi = payload
+                    logging.info(f"Memproses halaman {page_number} ({page_dpi} dpi)")
+                    future = pool.submit(_ocr_page_file, image_path, page_dpi)
+                pending.append((page_number, future))
+                if len(pending) >= max_in_flight:
+                    page_number, future = pending.popleft()
+                    yield page_number, _worker_result(future)
+            while pending:
+                page_number, future = pending.popleft()
+                yield page_number, _worker_result(future)
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+# Menulis hasil OCR dari cache dokumen. Jika file hasil sebelumnya masih ada, file tersebut dipakai ulang.
+def _output_from_cache(cached, output_path):
+    previous_output = cached.get("output_file")
+    if previous_output and os.path.exists(previous_output):
+        return previous_output
+    with open(output_path, "w") as f:
+        f.write(PAGE_SEPARATOR.join('\n\n'.join(page) for page in cached["pages"]))
+    return output_path
+
+# progress dipanggil sebagai progress(halaman_selesai, total_halaman) setiap satu halaman selesai,
+# cancel_event (threading.Event) dicek di antara halaman untuk membatalkan proses.
+# Mengembalikan ringkasan dokumen: path file hasil (bisa berupa file hasil sebelumnya jika PDF yang sama
+# sudah pernah di-OCR), jumlah halaman, dan jumlah halaman per sumber teks (text_layer, ocr, cache).
+def perform_ocr(pdf_path: str, output_path: str, workers: int = None, page_window: int = None,
+                progress=None, cancel_event=None, pdf_hash: str = None) -> dict:
+    workers = workers or OCR_WORKERS
+    page_window = page_window or OCR_PAGE_WINDOW
+
+    logging.info("Memulai eksekusi OCR.")
+    start_time = time.time()
+
+    # Cek cache dokumen: PDF dengan isi dan parameter OCR yang sama tidak perlu di-OCR ulang
+    doc_key = document_key(pdf_hash or file_sha256(pdf_path), OCR_SETTINGS)
+    cached = ocr_cache.get(doc_key)
+    ocr_cache.record("document", cached is not None)
+    if cached is not None:
+        output_path = _output_from_cache(cached, output_path)
+        cached["output_file"] = output_path
+        ocr_cache.put(doc_key, cached)
+        if progress:
+            progress(len(cached["pages"]), len(cached["pages"]))
+        logging.info(f"Hasil OCR diambil dari cache: {output_path}")
+        return {"output_file": output_path, "pages": len(cached["pages"]), "cached_document": True,
+                "page_sources": cached.get("page_sources", {})}
+
+    # Hasil ditulis bertahap ke file sementara agar memori tetap kecil, lalu di-rename ketika selesai.
+    # Paragraf dipisahkan baris kosong dan halaman dipisahkan form feed agar nomor halaman bisa dipakai chunker.
+    partial_path = f"{output_path}.part"
+    page_number = 0
+    pages = []
+    page_sources = {TEXT_LAYER: 0, OCR: 0, CACHE: 0}
+    try:
+        total_pages = count_pages(pdf_path)
+        logging.info(f"Total halaman: {total_pages}")
+        if progress:
+            progress(0, total_pages)
+
+        with open(partial_path, "w") as f:
+            for page_number, (ocr_results, source) in _iter_page_results(pdf_path, OCR_DPI, workers, page_window, total_pages):
+                if source != TEXT_LAYER:
+                    ocr_cache.record("page", source == CACHE)
+                page_sources[source] += 1
+                OCR_PAGES.inc(source=source)
+                if pages:
+                    f.write(PAGE_SEPARATOR)
+                pages.append(ocr_results)
+                f.write('\n\n'.join(ocr_results))
+                logging.info(f"OCR halaman {page_number} selesai.")
+                if progress:
+                    progress(page_number, total_pages)
+                if cancel_event is not None and cancel_event.is_set():
+                    raise OCRCancelled(f"OCR dibatalkan setelah halaman {page_number}")
+        os.replace(partial_path, output_path)
+        ocr_cache.put(doc_key, {"pages": pages, "output_file": output_path, "page_sources": page_sources})
+        ocr_cache.evict()
+
+    except OCRCancelled as e:
+        logging.info(str(e))
+        os.remove(partial_path)
+        raise e
+
+    except Exception as e:
+        logging.error(f"Error saat memproses halaman {page_number + 1}: {e}")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise e
 
     end_time = time.time()
     elapsed_time = end_time - start_time
     logging.info(f"Waktu yang dibutuhkan: {elapsed_time:.2f} detik")
+    logging.info(f"Sumber teks per halaman: {page_sources}")
     logging.info("Eksekusi OCR selesai.")
-
-    # Simpan hasil OCR ke file teks
-    with open(output_path, "w") as f:
-        f.write('\n\n'.join(ocr_results_all))
\ No newline at end of file
+    return {"output_file": output_path, "pages": len(pages), "cached_document": False, "page_sources": page_sources}
@@ -0,0 +1,71 @@
+import logging
+import os
+import cv2
+import numpy as np
+from pdf2image import convert_from_path
+from app.layout import detect_text_boxes
+
+# Preprocessing halaman: memilih DPI per halaman dan menjalankan deteksi layout pada salinan gambar yang diperkecil
+OCR_ADAPTIVE_DPI = os.getenv("OCR_ADAPTIVE_DPI", "1") == "1"
+OCR_MIN_DPI = int(os.getenv("OCR_MIN_DPI", "150"))
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+OCR_MAX_DPI = int(os.getenv("OCR_MAX_DPI", str(OCR_DPI)))
+OCR_PROBE_DPI = int(os.getenv("OCR_PROBE_DPI", "100"))  # DPI untuk rasterisasi cepat saat memilih DPI
+OCR_TARGET_TEXT_HEIGHT = int(os.getenv("OCR_TARGET_TEXT_HEIGHT", "20"))  # Tinggi huruf (piksel) yang diinginkan
+OCR_LAYOUT_SCALE = float(os.getenv("OCR_LAYOUT_SCALE", "0.5"))  # Skala gambar untuk deteksi layout
+LAYOUT_BASE_DPI = 300  # Parameter layout (kernel, batas tinggi box) ditentukan untuk halaman 300 dpi
+DPI_STEP = 25
+MIN_TEXT_COMPONENTS = 20
+MIN_INK_RATIO = 0.001
+
+# Memperkirakan DPI yang cukup untuk satu halaman dari gambar grayscale hasil rasterisasi kasar.
+# Tinggi huruf diperkirakan dari median tinggi connected component, lalu DPI dipilih agar huruf
+# setinggi OCR_TARGET_TEXT_HEIGHT piksel.
+def estimate_dpi(gray, probe_dpi=OCR_PROBE_DPI, min_dpi=OCR_MIN_DPI, max_dpi=OCR_MAX_DPI):
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    if np.count_nonzero(binary) < binary.size * MIN_INK_RATIO:
+        return min_dpi  # Halaman (hampir) kosong
+
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    # Ambil komponen yang kemungkinan berupa huruf, bukan garis, tabel, atau gambar
+    is_text = (heights >= 2) & (heights <= gray.shape[0] * 0.05) & (widths <= heights * 4)
+    if np.count_nonzero(is_text) < MIN_TEXT_COMPONENTS:
+        return max_dpi  # Tidak cukup data, pakai DPI tertinggi agar aman
+
+    text_height = float(np.median(heights[is_text]))
+    dpi = probe_dpi * OCR_TARGET_TEXT_HEIGHT / text_height
+    dpi = int(round(dpi / DPI_STEP) * DPI_STEP)
+    return min(max(dpi, min_dpi), max_dpi)
+
+# Memilih DPI untuk halaman first_page..last_page dengan satu kali rasterisasi beresolusi rendah
+def choose_dpis(pdf_path, first_page, last_page, default_dpi=OCR_MAX_DPI):
+    if not OCR_ADAPTIVE_DPI:
+        return [default_dpi] * (last_page - first_page + 1)
+    probes = convert_from_path(pdf_path, dpi=OCR_PROBE_DPI, first_page=first_page, last_page=last_page,
+                               grayscale=True)
+    dpis = [estimate_dpi(np.array(probe)) for probe in probes]
+    logging.debug(f"DPI halaman {first_page}-{last_page}: {dpis}")
+    return dpis
+
+# Mendeteksi area paragraf pada salinan gambar yang diperkecil, lalu memetakan box kembali ke resolusi penuh
+def find_text_boxes(image, dpi, layout_scale=OCR_LAYOUT_SCALE):
+    scale = dpi / LAYOUT_BASE_DPI
+    if layout_scale >= 1:
+        return detect_text_boxes(image, scale)
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, None, fx=layout_scale, fy=layout_scale, interpolation=cv2.INTER_AREA)
+    boxes = detect_text_boxes(small, scale * layout_scale)
+    if len(boxes) == 0:
+        return boxes
+
+    # Perlebar box sebesar satu piksel gambar kecil agar hasil pemetaan tidak memotong tepi huruf
+    height, width = gray.shape[:2]
+    margin = int(np.ceil(1 / layout_scale))
+    x1 = np.clip(np.floor(boxes[:, 0] / layout_scale) - margin, 0, width)
+    y1 = np.clip(np.floor(boxes[:, 1] / layout_scale) - margin, 0, height)
+    x2 = np.clip(np.ceil((boxes[:, 0] + boxes[:, 2]) / layout_scale) + margin, 0, width)
+    y2 = np.clip(np.ceil((boxes[:, 1] + boxes[:, 3]) / layout_scale) + margin, 0, height)
+    return np.column_stack((x1, y1, x2 - x1, y2 - y1)).astype(np.int64)
@@ -0,0 +1,59 @@
+import logging
+import os
+import re
+import subprocess
+
+# Jalur cepat untuk PDF born-digital: teks diambil langsung dari text layer PDF (pdftotext dari poppler-utils)
+# sehingga halaman tersebut tidak perlu dirasterisasi dan di-OCR
+OCR_TEXT_LAYER = os.getenv("OCR_TEXT_LAYER", "1") == "1"
+OCR_TEXT_LAYER_MIN_CHARS = int(os.getenv("OCR_TEXT_LAYER_MIN_CHARS", "100"))  # Minimal karakter per halaman
+OCR_TEXT_LAYER_MIN_QUALITY = float(os.getenv("OCR_TEXT_LAYER_MIN_QUALITY", "0.9"))  # Minimal proporsi karakter wajar
+MAX_AVERAGE_WORD_LENGTH = 20
+PUNCTUATION = set(".,;:!?()[]{}\"'/-–—%&*+=<>@#$§°•·’‘“”")
+
+# Mengambil text layer untuk halaman first_page..last_page, satu string per halaman
+def extract_text_pages(pdf_path, first_page, last_page):
+    result = subprocess.run(
+        ["pdftotext", "-f", str(first_page), "-l", str(last_page), "-enc", "UTF-8", pdf_path, "-"],
+        capture_output=True, check=True,
+    )
+    # pdftotext menandai akhir setiap halaman dengan form feed
+    pages = result.stdout.decode("utf-8", errors="replace").split("\f")
+    page_count = last_page - first_page + 1
+    return (pages + [""] * page_count)[:page_count]
+
+# Memeriksa apakah text layer cukup panjang dan bersih untuk dipakai tanpa OCR
+def is_good_text(text):
+    stripped = text.strip()
+    if len(stripped) < OCR_TEXT_LAYER_MIN_CHARS:
+        return False
+    # Font tanpa tabel unicode biasanya menghasilkan karakter pengganti atau "(cid:123)"
+    if "�" in stripped or "(cid:" in stripped:
+        return False
+    characters = [c for c in stripped if not c.isspace()]
+    readable = sum(1 for c in characters if c.isalnum() or c in PUNCTUATION)
+    if readable / len(characters) < OCR_TEXT_LAYER_MIN_QUALITY:
+        return False
+    words = stripped.split()
+    return len(characters) / len(words) <= MAX_AVERAGE_WORD_LENGTH
+
+# Mengubah teks satu halaman menjadi paragraf dengan format yang sama seperti hasil OCR
+def text_to_paragraphs(text):
+    paragraphs = []
+    for block in re.split(r'\n\s*\n', text):
+        paragraph = re.sub(r'\s+', ' ', block).strip()
+        if len(paragraph) > 10:
+            paragraphs.append(paragraph)
+    return paragraphs
+
+# Mengembalikan {nomor_halaman: paragraf} untuk halaman yang text layer-nya layak dipakai
+def text_layer_pages(pdf_path, first_page, last_page):
+    if not OCR_TEXT_LAYER:
+        return {}
+    try:
+        texts = extract_text_pages(pdf_path, first_page, last_page)
+    except (OSError, subprocess.CalledProcessError) as e:
+        logging.warning(f"Gagal membaca text layer halaman {first_page}-{last_page}: {e}")
+        return {}
+    return {page_number: text_to_paragraphs(text)
+            for page_number, text in enumerate(texts, start=first_page) if is_good_text(text)}
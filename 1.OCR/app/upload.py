@@ -0,0 +1,36 @@
+import hashlib
+import os
+import tempfile
+from starlette.concurrency import run_in_threadpool
+
+# Konfigurasi penyimpanan upload (bisa diubah lewat environment variable)
+OCR_UPLOAD_DIR = os.getenv("OCR_UPLOAD_DIR", tempfile.gettempdir())
+OCR_MAX_UPLOAD_BYTES = int(os.getenv("OCR_MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Exception ketika ukuran file upload melebihi batas
+class UploadTooLarge(Exception):
+    pass
+
+# Menyimpan file upload ke file sementara yang unik per potongan (chunk) sambil menghitung hash SHA-256,
+# sehingga memori yang dipakai per upload tetap konstan. Mengembalikan (path, sha256, ukuran).
+async def save_upload(file, directory=OCR_UPLOAD_DIR, max_bytes=OCR_MAX_UPLOAD_BYTES):
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=".pdf", dir=directory)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Ukuran file melebihi batas {max_bytes} byte")
+                digest.update(chunk)
+                await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest(), size
@@ -0,0 +1,110 @@
+import argparse
+import time
+import cv2
+import numpy as np
+from app.layout import bounding_boxes, group_and_merge, remove_nested_boxes
+
+# Micro-benchmark tahap layout: implementasi lama (loop Python) dibandingkan versi NumPy
+# pada kumpulan kontur sintetis. Jalankan dari folder 1.OCR: python bench_layout.py
+
+# Implementasi lama, disalin apa adanya dari perform_ocr sebagai pembanding
+def legacy_layout(cnts):
+    def is_inside(inner, outer):
+        x1, y1, w1, h1 = inner
+        x2, y2, w2, h2 = outer
+        return x1 >= x2 and y1 >= y2 and x1 + w1 <= x2 + w2 and y1 + h1 <= y2 + h2
+
+    def remove_nested(boxes):
+        filtered_boxes = []
+        for i in range(len(boxes)):
+            is_nested = False
+            for j in range(len(boxes)):
+                if i != j and is_inside(boxes[i], boxes[j]):
+                    is_nested = True
+                    break
+            if not is_nested:
+                filtered_boxes.append(boxes[i])
+        return filtered_boxes
+
+    cnts = sorted(cnts, key=lambda x: cv2.boundingRect(x)[1])
+    grouped_rois = []
+    current_group = []
+    for c in cnts:
+        x, y, w, h = cv2.boundingRect(c)
+        if not (1540 > h > 50 and w > 10):
+            continue
+        if current_group and abs(y - current_group[-1][1]) > h / 2:
+            grouped_rois.append(current_group)
+            current_group = []
+        if not current_group or abs(current_group[-1][3] - h) <= 100:
+            current_group.append((x, y, w, h))
+        else:
+            grouped_rois.append(current_group)
+            current_group = [(x, y, w, h)]
+    if current_group:
+        grouped_rois.append(current_group)
+
+    merged_rois = []
+    for group in grouped_rois:
+        if len(group) == 1:
+            merged_rois.append(group[0])
+        else:
+            heights = [h for x, y, w, h in group]
+            if max(heights) - min(heights) <= 100:
+                x_min = min([x for x, y, w, h in group])
+                y_min = min([y for x, y, w, h in group])
+                x_max = max([x + w for x, y, w, h in group])
+                y_max = max([y + h for x, y, w, h in group])
+                merged_rois.append((x_min, y_min, x_max - x_min, y_max - y_min))
+            else:
+                merged_rois.extend(group)
+    return remove_nested(merged_rois)
+
+def vectorized_layout(cnts):
+    return remove_nested_boxes(group_and_merge(bounding_boxes(cnts)))
+
+# Membuat kontur sintetis berbentuk poligon acak di dalam halaman A4 300 dpi
+def synthetic_contours(count, rng, width=2480, height=3508):
+    cnts = []
+    for _ in range(count):
+        w = int(rng.integers(5, 1200))
+        h = int(rng.integers(20, 400))
+        x = int(rng.integers(0, width - w))
+        y = int(rng.integers(0, height - h))
+        n_points = int(rng.integers(4, 12))
+        xs = rng.integers(x, x + w + 1, size=n_points)
+        ys = rng.integers(y, y + h + 1, size=n_points)
+        # Pastikan sudut-sudut bounding box ikut menjadi titik kontur
+        xs[:2], ys[:2] = (x, x + w), (y, y + h)
+        cnts.append(np.column_stack((xs, ys)).reshape(-1, 1, 2).astype(np.int32))
+    return cnts
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark analisis layout")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000, 2000, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'kontur':>7} {'box':>5} {'lama (ms)':>10} {'numpy (ms)':>11} {'speedup':>8}")
+    for size in args.sizes:
+        cnts = synthetic_contours(size, rng)
+
+        expected = legacy_layout(cnts)
+        actual = vectorized_layout(cnts)
+        assert [tuple(box) for box in actual.tolist()] == [tuple(box) for box in expected], \
+            f"Hasil berbeda untuk {size} kontur"
+
+        timings = []
+        for fn in (legacy_layout, vectorized_layout):
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                fn(cnts)
+                best = min(best, time.perf_counter() - start)
+            timings.append(best * 1000)
+        print(f"{size:>7} {len(expected):>5} {timings[0]:>10.2f} {timings[1]:>11.2f} {timings[0] / timings[1]:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
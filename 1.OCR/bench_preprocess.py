@@ -0,0 +1,62 @@
+import argparse
+import os
+import time
+import cv2
+import numpy as np
+from pdf2image import convert_from_path
+from app.layout import detect_text_boxes
+from app.ocr import OCR_DPI, count_pages, iter_pages, recognize_rois
+from app.preprocess import find_text_boxes
+
+# Membandingkan throughput preprocessing lama (300 dpi tetap, blur yang tidak terpakai, layout resolusi penuh)
+# dengan preprocessing adaptif (DPI per halaman, layout pada gambar yang diperkecil) pada satu folder PDF.
+# Jalankan dari folder 1.OCR: python bench_preprocess.py folder_pdf [--skip-recognition]
+
+def legacy_pages(pdf_path, dpi):
+    for page_number in range(1, count_pages(pdf_path) + 1):
+        img = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)[0]
+        image = np.array(img)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        cv2.GaussianBlur(gray, (99, 99), 0)  # Pekerjaan lama yang hasilnya tidak pernah dipakai
+        yield image, detect_text_boxes(image)
+
+def adaptive_pages(pdf_path, dpi):
+    for _, img, page_dpi in iter_pages(pdf_path, dpi):
+        image = np.array(img)
+        yield image, find_text_boxes(image, page_dpi)
+
+def run(pages, skip_recognition):
+    page_count, roi_count, characters = 0, 0, 0
+    start = time.perf_counter()
+    for image, boxes in pages:
+        rois = [image[y:y+h, x:x+w] for x, y, w, h in boxes.tolist()]
+        if not skip_recognition:
+            characters += sum(len(text) for text in recognize_rois(rois))
+        page_count += 1
+        roi_count += len(rois)
+    return page_count, roi_count, characters, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Perbandingan throughput preprocessing OCR")
+    parser.add_argument("corpus_dir", help="Folder berisi file PDF")
+    parser.add_argument("--dpi", type=int, default=OCR_DPI)
+    parser.add_argument("--skip-recognition", action="store_true", help="Hanya ukur rasterisasi dan layout")
+    args = parser.parse_args()
+
+    pdfs = sorted(os.path.join(args.corpus_dir, f) for f in os.listdir(args.corpus_dir) if f.lower().endswith(".pdf"))
+    totals = {"lama": [0, 0.0], "adaptif": [0, 0.0]}
+    print(f"{'dokumen':<30} {'mode':<8} {'halaman':>7} {'roi':>5} {'karakter':>9} {'detik':>8} {'hal/detik':>9}")
+    for pdf_path in pdfs:
+        for mode, pages in (("lama", legacy_pages(pdf_path, args.dpi)), ("adaptif", adaptive_pages(pdf_path, args.dpi))):
+            page_count, roi_count, characters, elapsed = run(pages, args.skip_recognition)
+            totals[mode][0] += page_count
+            totals[mode][1] += elapsed
+            print(f"{os.path.basename(pdf_path)[:30]:<30} {mode:<8} {page_count:>7} {roi_count:>5} {characters:>9} "
+                  f"{elapsed:>8.2f} {page_count / elapsed:>9.2f}")
+
+    for mode, (page_count, elapsed) in totals.items():
+        if elapsed:
+            print(f"Total {mode}: {page_count} halaman dalam {elapsed:.2f} detik ({page_count / elapsed:.2f} halaman/detik)")
+
+if __name__ == "__main__":
+    main()
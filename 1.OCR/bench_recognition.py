@@ -0,0 +1,40 @@
+import argparse
+import time
+import numpy as np
+from app.preprocess import find_text_boxes
+from app.ocr import OCR_DPI, iter_pages, recognize_rois
+
+# Membandingkan waktu recognition per halaman antara mode "single" (satu readtext per ROI) dan "batched"
+# Jalankan dari folder 1.OCR: python bench_recognition.py dokumen.pdf
+def main():
+    parser = argparse.ArgumentParser(description="Perbandingan waktu recognition ROI per halaman")
+    parser.add_argument("pdf_path")
+    parser.add_argument("--dpi", type=int, default=OCR_DPI)
+    parser.add_argument("--pages", type=int, default=None, help="Batasi jumlah halaman yang diuji")
+    args = parser.parse_args()
+
+    totals = {"single": 0.0, "batched": 0.0}
+    print(f"{'halaman':>7} {'roi':>5} {'single (s)':>11} {'batched (s)':>12} {'speedup':>8} {'sama':>5}")
+    for page_number, img, page_dpi in iter_pages(args.pdf_path, dpi=args.dpi):
+        if args.pages and page_number > args.pages:
+            break
+        image = np.array(img)
+        rois = [image[y:y+h, x:x+w] for x, y, w, h in find_text_boxes(image, page_dpi)]
+
+        timings, texts = {}, {}
+        for mode in ("single", "batched"):
+            start = time.perf_counter()
+            texts[mode] = recognize_rois(rois, mode)
+            timings[mode] = time.perf_counter() - start
+            totals[mode] += timings[mode]
+
+        speedup = timings["single"] / timings["batched"] if timings["batched"] else float("nan")
+        same = "ya" if texts["single"] == texts["batched"] else "tidak"
+        print(f"{page_number:>7} {len(rois):>5} {timings['single']:>11.3f} {timings['batched']:>12.3f} {speedup:>7.2f}x {same:>5}")
+
+    if totals["batched"]:
+        print(f"Total: single {totals['single']:.2f} detik, batched {totals['batched']:.2f} detik, "
+              f"speedup {totals['single'] / totals['batched']:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,124 @@
 import logging
+import threading
+from typing import List
 from fastapi import FastAPI, HTTPException
-from app.qdrant import update_collection, search_peraturan
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from app.qdrant import (client, collection_name, directory_path, update_collection, update_progress, search_peraturan,
+                        migrate)
+from rag_common.collection_profiles import PROFILES, collection_info
+from rag_common.batcher import query_batcher
+from rag_common.embedding import embedding_engine
+from rag_common.indexing import IndexerBusy, invalidate_answer_cache
+from rag_common.metrics import configure_logging, instrument_app, span
+from rag_common.models import EMBEDDING_MODEL, registry
 
-# Inisialisasi logger
-logging.basicConfig(level=logging.INFO)
+# Inisialisasi logger (level lewat LOG_LEVEL, default INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
+instrument_app(app)
+update_lock = threading.Lock()
+
+# Batas jumlah teks per request /embed
+EMBED_MAX_TEXTS = 256
+
+class EmbedRequest(BaseModel):
+    texts: List[str]
+
+@app.on_event("startup")
+async def warmup_models():
+    registry.warmup_in_background(["embedding"])
+
+@app.on_event("shutdown")
+def stop_embedding_pool():
+    embedding_engine.close()
+    query_batcher.close()
 
 @app.get("/")
 async def read_root():
     return {"message": "Berhasil!"}
 
+@app.get("/health")
+async def health():
+    status = registry.status(["embedding"])
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
+
+# Endpoint sinkron agar update berjalan di threadpool dan tidak memblokir /search/
 @app.get("/status_qdrant/")
-async def status_qdrant():
+def status_qdrant():
+    if not update_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Pembaruan Qdrant sedang berjalan")
     logger.info("Memulai proses pembaruan Qdrant")
     try:
-        directory_path = "/OCR/result_ocr"
-        update_collection(directory_path)
-        logger.info("Collection Qdrant berhasil diperbarui.")
-        return {"status": "Qdrant berhasil diperbarui"}
+        stats = update_collection(directory_path)
+        logger.info(f"Collection Qdrant berhasil diperbarui: {stats}")
+        if stats["points_upserted"] or stats["points_deleted"]:
+            invalidate_answer_cache()
+        return {"status": "Qdrant berhasil diperbarui", "stats": stats}
+
+    except IndexerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
     
     except Exception as e:
         logger.error(f"Terjadi kesalahan saat memperbarui Qdrant: {str(e)}")
+        # Sebagian file mungkin sudah berubah sebelum error terjadi
+        invalidate_answer_cache()
         raise HTTPException(status_code=500, detail="Qdrant gagal diperbarui")
 
+    finally:
+        update_lock.release()
+
+@app.get("/status_qdrant/progress")
+async def status_qdrant_progress():
+    return update_progress
+
+@app.get("/collection/")
+def get_collection_info():
+    return collection_info(client, collection_name)
+
+# Migrasi collection ke profil lain (kuantisasi, on-disk, HNSW) tanpa menghentikan pencarian
+@app.post("/collection/migrate")
+def migrate_collection(profile: str, keep_old: bool = False):
+    if profile not in PROFILES:
+        raise HTTPException(status_code=400, detail=f"Profil tidak dikenal, pilihan: {', '.join(PROFILES)}")
+    if not update_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Pembaruan Qdrant sedang berjalan")
+    logger.info(f"Memulai migrasi collection ke profil {profile}")
+    try:
+        return migrate(profile, keep_old)
+
+    except IndexerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    except Exception as e:
+        logger.error(f"Migrasi collection gagal: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Migrasi collection gagal: {str(e)}")
+
+    finally:
+        update_lock.release()
+
+@app.get("/embedding/stats")
+async def embedding_stats():
+    return query_batcher.stats()
+
+# Worker embedding bersama: service lain (mis. LLM dengan EMBEDDING_URL) meng-encode query lewat endpoint ini
+# sehingga hanya service ini yang memuat model. Teks dari semua request digabung oleh micro-batcher yang sama
+# dengan /search/; endpoint sinkron agar berjalan di threadpool.
+@app.post("/embed")
+def embed(request: EmbedRequest):
+    if len(request.texts) > EMBED_MAX_TEXTS:
+        raise HTTPException(status_code=413, detail=f"Maksimal {EMBED_MAX_TEXTS} teks per request")
+    with span("embed"):
+        futures = [query_batcher.submit(text) for text in request.texts]
+        vectors = [future.result().tolist() for future in futures]
+    return {"model": EMBEDDING_MODEL, "vectors": vectors}
+
+# Endpoint sinkron agar pencarian yang datang bersamaan berjalan paralel di threadpool dan embedding-nya digabung
 @app.get("/search/")
-async def search(query: str):
-    logger.info(f"Memulai pencarian dengan query: {query}")
+def search(query: str):
+    logger.info(f"Memulai pencarian ({len(query)} karakter)")
     try:
         results = search_peraturan(query)
         
@@ -1,73 +1,40 @@
-import torch
-import os
-from sentence_transformers import SentenceTransformer
-import qdrant_client
-from qdrant_client.http.models import PointStruct, VectorParams, Distance, Filter
-
-# Inisialisasi Qdrant dan model Sentence Transformers
-directory_path = "/OCR/result_ocr"
-collection_name = "EBook"
-client = qdrant_client.QdrantClient("http://10.12.9.105:6333")
-model = SentenceTransformer('paraphrase-multilingual-mpnet-base-v2', device='cuda' if torch.cuda.is_available() else 'cpu')
-
-# Fungsi untuk mendapatkan embedding dari teks
+import logging
+from rag_common.batcher import query_batcher
+from rag_common.collection_profiles import QDRANT_COLLECTION, get_profile
+from rag_common.indexing import OCR_RESULT_DIR, QDRANT_MANIFEST_PATH, Indexer
+from rag_common.metrics import span
+from rag_common.query import search
+from rag_common.sparse import SparseSupportCache
+from rag_common.upsert import QDRANT_URL, create_client
+
+logger = logging.getLogger(__name__)
+
+# Inisialisasi Qdrant; chunk -> embed -> upsert dan pencarian memakai pipeline bersama di rag_common
+directory_path = OCR_RESULT_DIR
+collection_name = QDRANT_COLLECTION
+client = create_client(QDRANT_URL)
+sparse_support = SparseSupportCache()
+
+# Progres pembaruan collection yang sedang/terakhir berjalan
+update_progress = {}
+indexer = Indexer(client, collection_name, QDRANT_MANIFEST_PATH, progress=update_progress,
+                  sparse_support=sparse_support)
+
+# Fungsi untuk mendapatkan embedding dari teks query; query yang datang bersamaan di-encode dalam satu batch
 def get_embeddings(text):
-    return model.encode(text)
-
-# Fungsi untuk membaca teks dari file .txt
-def read_text_files(directory_path):
-    peraturan_text = ""
-    for filename in os.listdir(directory_path):
-        if filename.endswith('.txt'):
-            file_path = os.path.join(directory_path, filename)
-            with open(file_path, 'r', encoding='utf-8') as file:
-                peraturan_text += file.read() + '\n\n'
-    return peraturan_text
+    return query_batcher.encode(text)
 
-# Fungsi untuk memeriksa dan membuat collection jika belum ada
-def ensure_collection_exists():
-    collections = client.get_collections().collections
-    if collection_name not in [c.name for c in collections]:
-        client.recreate_collection(
-            collection_name=collection_name,
-            vectors_config=VectorParams(size=768, distance=Distance.COSINE)  # Sesuaikan ukuran dengan embedding
-        )
-
-# Fungsi untuk menghapus semua poin dalam koleksi
-def clear_collection():
-    client.delete(
-        collection_name=collection_name,
-        points_selector=Filter(must=[]),  # Filter kosong untuk menghapus semua poin
-    )
-
-# Fungsi untuk memperbarui collection Qdrant sesuai file .txt
+# Fungsi untuk memperbarui collection Qdrant sesuai file .txt secara inkremental
 def update_collection(directory_path):
-    ensure_collection_exists()
-    
-    # Menghapus semua poin di koleksi sebelum memperbarui
-    clear_collection()
-    
-    peraturan_text = read_text_files(directory_path)
-    paragraphs = peraturan_text.split('\n\n')
-    embeddings = [get_embeddings(p) for p in paragraphs]
-
-    points = [
-        PointStruct(id=i, vector=embeddings[i], payload={"text": paragraphs[i]})
-        for i in range(len(paragraphs))
-    ]
+    return indexer.update_collection(directory_path)
 
-    client.upsert(
-        collection_name=collection_name,
-        wait=True,
-        points=points
-    )
+# Fungsi untuk memigrasikan collection ke profil lain tanpa menghapus data
+def migrate(profile_name=None, keep_old=False):
+    return indexer.migrate(get_profile(profile_name), keep_old)
 
-# Fungsi untuk mencari paragraf yang relevan berdasarkan pertanyaan
+# Fungsi untuk mencari paragraf yang relevan berdasarkan pertanyaan: hybrid BM25 + dense dengan RRF
+# jika collection punya sparse vector, selain itu hanya dense
 def search_peraturan(query):
-    query_vector = get_embeddings(query)
-    results = client.search(
-        collection_name=collection_name,
-        query_vector=query_vector,
-        limit=5
-    )
-    return [res.payload["text"] for res in results]
+    with span("embed"):
+        query_vector = get_embeddings(query)
+    return [text for text, _ in search(client, collection_name, query, query_vector, 5, sparse_support)]
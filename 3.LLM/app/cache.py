@@ -0,0 +1,132 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# Cache dua tingkat untuk /ask:
+# 1. LRU exact-match dari query yang dinormalisasi ke embedding-nya, sehingga pertanyaan yang sama tidak di-embed ulang.
+# 2. Cache semantik jawaban: jika embedding query baru cukup mirip (cosine >= threshold) dengan query yang
+#    jawabannya sudah ada, jawaban tersebut dikembalikan tanpa pencarian Qdrant dan generasi Ollama.
+# Cache jawaban dikosongkan lewat POST /cache/invalidate setiap kali service Qdrant memperbarui collection.
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # Minimal cosine similarity
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "86400"))  # Detik, 0 berarti tanpa batas waktu
+
+# Menormalisasi query agar variasi huruf besar, spasi, dan tanda baca di ujung dianggap sama
+def normalize_query(query):
+    return re.sub(r'\s+', ' ', query).strip().strip('?!.,').strip().lower()
+
+def _hit_rate(hits, misses):
+    total = hits + misses
+    return round(hits / total, 4) if total else None
+
+class EmbeddingCache:
+    def __init__(self, max_size=QUERY_EMBEDDING_CACHE_SIZE):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            vector = self._items.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key, vector):
+        with self._lock:
+            self._items[key] = vector
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._items), "max_size": self.max_size, "hits": self.hits,
+                    "misses": self.misses, "hit_rate": _hit_rate(self.hits, self.misses)}
+
+class AnswerCache:
+    def __init__(self, max_size=ANSWER_CACHE_SIZE, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl = ttl
+        self._entries = []  # dict: query, vector (ternormalisasi), answer, created, last_used
+        self._matrix = None  # Vektor semua entri, dibangun ulang saat isi cache berubah
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now):
+        if self.ttl:
+            entries = [e for e in self._entries if now - e["created"] < self.ttl]
+            if len(entries) != len(self._entries):
+                self._entries = entries
+                self._matrix = None
+
+    # Mengembalikan (jawaban, similarity) untuk entri paling mirip, atau (None, similarity) jika di bawah threshold
+    def lookup(self, vector):
+        query_vector = self._unit(vector)
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            if not self._entries:
+                self.misses += 1
+                return None, None
+            if self._matrix is None:
+                self._matrix = np.stack([e["vector"] for e in self._entries])
+            similarities = self._matrix @ query_vector
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None, similarity
+            entry = self._entries[best]
+            entry["last_used"] = now
+            self.hits += 1
+            return entry["answer"], similarity
+
+    # generation diambil sebelum jawaban dibuat; jawaban yang dibuat sebelum invalidasi tidak disimpan
+    def put(self, query, vector, answer, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+            now = time.time()
+            self._entries.append({"query": query, "vector": self._unit(vector), "answer": answer,
+                                  "created": now, "last_used": now})
+            if len(self._entries) > self.max_size:
+                self._entries.remove(min(self._entries, key=lambda e: e["last_used"]))
+            self._matrix = None
+
+    def invalidate(self):
+        with self._lock:
+            cleared = len(self._entries)
+            self._entries = []
+            self._matrix = None
+            self.generation += 1
+            self.invalidations += 1
+            return cleared
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "threshold": self.threshold,
+                    "hits": self.hits, "misses": self.misses, "hit_rate": _hit_rate(self.hits, self.misses),
+                    "invalidations": self.invalidations}
+
+embedding_cache = EmbeddingCache()
+answer_cache = AnswerCache()
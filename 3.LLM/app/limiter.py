@@ -0,0 +1,65 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+# Pembatas jumlah generasi Ollama yang berjalan bersamaan. Request yang melebihi batas menunggu di antrean
+# (dengan batas panjang dan waktu tunggu) sehingga Ollama tidak kebanjiran dan request lain tetap dilayani.
+OLLAMA_MAX_CONCURRENT = int(os.getenv("OLLAMA_MAX_CONCURRENT", "4"))
+OLLAMA_MAX_QUEUE = int(os.getenv("OLLAMA_MAX_QUEUE", "32"))
+OLLAMA_QUEUE_TIMEOUT = float(os.getenv("OLLAMA_QUEUE_TIMEOUT", "30"))  # Detik menunggu slot
+
+# Exception ketika antrean sudah penuh
+class QueueFull(Exception):
+    pass
+
+# Exception ketika slot tidak didapat dalam batas waktu tunggu
+class QueueTimeout(Exception):
+    pass
+
+class ConcurrencyLimiter:
+    def __init__(self, max_concurrent=OLLAMA_MAX_CONCURRENT, max_queue=OLLAMA_MAX_QUEUE,
+                 queue_timeout=OLLAMA_QUEUE_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def is_full(self):
+        return self.active >= self.max_concurrent and self.waiting >= self.max_queue
+
+    # Menolak request (dan mencatatnya) jika antrean sudah penuh; dipakai sebelum respons mulai dikirim
+    def admit_or_raise(self):
+        if self.is_full():
+            self.rejected += 1
+            raise QueueFull(f"Antrean generasi penuh ({self.max_queue} request menunggu)")
+
+    @asynccontextmanager
+    async def slot(self):
+        self.admit_or_raise()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise QueueTimeout(f"Tidak mendapat slot generasi dalam {self.queue_timeout} detik")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self):
+        return {"max_concurrent": self.max_concurrent, "max_queue": self.max_queue, "active": self.active,
+                "waiting": self.waiting, "completed": self.completed, "rejected": self.rejected,
+                "timeouts": self.timeouts}
+
+ollama_limiter = ConcurrencyLimiter()
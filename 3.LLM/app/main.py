@@ -1,105 +1,334 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
-import qdrant_client
-import torch
-from ollama import Client
+from typing import Optional
+from qdrant_client import AsyncQdrantClient
+from ollama import AsyncClient
+import asyncio
+import httpx
+import json
 import logging
+import os
+import time
+from rag_common.batcher import query_batcher
+from rag_common.collection_profiles import QDRANT_COLLECTION
+from rag_common.metrics import configure_logging, instrument_app, metrics, record, span
+from rag_common.models import registry
+from rag_common.query import SYSTEM_PROMPT, async_search, build_followup_prompt, build_prompt
+from rag_common.remote_embedding import EMBEDDING_URL, RemoteEmbedder
+from rag_common.retrieval import RETRIEVAL_CANDIDATES, RETRIEVAL_SCORE_THRESHOLD, select_contexts
+from rag_common.sparse import SparseSupportCache
+from rag_common.upsert import QDRANT_URL
+from app.cache import embedding_cache, answer_cache, normalize_query
+from app.limiter import ollama_limiter, QueueFull, QueueTimeout
+from app.sessions import SESSION_REUSE_THRESHOLD, is_short_followup, session_store
 
-# Setup logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Setup logging (level lewat LOG_LEVEL, default INFO); isi query tidak pernah ditulis ke log
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
+instrument_app(app)
 
-# Inisialisasi model dan klien
-model = SentenceTransformer('paraphrase-multilingual-mpnet-base-v2', device='cuda' if torch.cuda.is_available() else 'cpu')
-client_qdrant = qdrant_client.QdrantClient("http://qdrant_db:6333")
-ollama_client = Client(host='http://ollama_api:11434')
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "10"))  # Detik untuk membuka koneksi ke Ollama
+# Detik menunggu data dari Ollama, termasuk token pertama: memuat model dari disk atau prefill panjang di CPU bisa
+# memakan beberapa menit sebelum token pertama, jadi batasnya jauh lebih longgar dari batas koneksi
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "600"))
+OLLAMA_GENERATION_TIMEOUT = float(os.getenv("OLLAMA_GENERATION_TIMEOUT", "300"))  # Detik decode sejak token pertama
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://ollama_api:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1")
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # Model dan KV cache tetap dimuat di antara giliran
+# Panjang konteks model; harus cukup untuk riwayat sesi + konteks + jawaban. Nilainya tetap agar model tidak dimuat ulang.
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
 
+# Inisialisasi klien async. Dengan EMBEDDING_URL, query di-embed oleh worker embedding di service Qdrant dan model
+# tidak dimuat di sini; tanpa EMBEDDING_URL model dimuat lazily lewat registry bersama dan query dijalankan oleh
+# micro-batcher di thread tersendiri agar tidak memblokir event loop.
+client_qdrant = AsyncQdrantClient(QDRANT_URL)
+ollama_client = AsyncClient(host=OLLAMA_HOST, timeout=httpx.Timeout(OLLAMA_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT))
+remote_embedder = RemoteEmbedder() if EMBEDDING_URL else None
+sparse_support = SparseSupportCache()
+
+# Metrik generasi: waktu sampai token pertama dan laju decode Ollama, serta isi antrean limiter
+LLM_TIME_TO_FIRST_TOKEN = metrics.histogram("rag_llm_time_to_first_token_seconds",
+                                            "Waktu dari request ke Ollama sampai token pertama")
+LLM_DECODE_RATE = metrics.histogram("rag_llm_decode_tokens_per_second", "Laju decode Ollama per jawaban",
+                                    buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300))
+metrics.gauge("rag_llm_active_generations", "Generasi yang sedang berjalan", lambda: ollama_limiter.active)
+metrics.gauge("rag_llm_waiting_generations", "Generasi yang menunggu slot", lambda: ollama_limiter.waiting)
+SESSION_TURNS = metrics.counter("rag_session_turns_total", "Giliran percakapan menurut sumber konteks", ("context",))
+
+# session_id opsional: tanpa sesi setiap pertanyaan dijawab berdiri sendiri
 class QueryModel(BaseModel):
     prompt: str
-        
+    session_id: Optional[str] = None
 
-def get_embeddings(text):
-    logger.debug("Generating embeddings for the query.")
-    return model.encode(text)
+# Embedding query diambil dari cache LRU jika query yang sama (setelah dinormalisasi) pernah di-embed
+async def get_embeddings(text):
+    key = normalize_query(text)
+    vector = embedding_cache.get(key)
+    if vector is None:
+        with span("embed"):
+            if remote_embedder is not None:
+                vector = await remote_embedder.embed(text)
+            else:
+                vector = await asyncio.wrap_future(query_batcher.submit(text))
+        embedding_cache.put(key, vector)
+    return vector
 
-def search_peraturan(query):
-    logger.info("Searching for regulations with query: %s", query)
-    query_vector = get_embeddings(query)
+# Pencarian hybrid (BM25 + dense dengan RRF) jika collection punya sparse vector, selain itu hanya dense
+async def search_peraturan(query, query_vector=None):
+    if query_vector is None:
+        query_vector = await get_embeddings(query)
     try:
-        results = client_qdrant.search(
-            collection_name="EBook",
-            query_vector=query_vector,
-            with_vectors=True,
-            with_payload=True
-        )
-        logger.info("Search results found: %d", len(results))
-        return [res.payload["text"] for res in results]
+        results = await async_search(client_qdrant, QDRANT_COLLECTION, query, query_vector, RETRIEVAL_CANDIDATES,
+                                     sparse_support, score_threshold=RETRIEVAL_SCORE_THRESHOLD)
+        with span("select"):
+            contexts, context_tokens = select_contexts(results)
+        logger.info("Search results found: %d, contexts used: %d (~%d tokens)", len(results), len(contexts), context_tokens)
+        return contexts
     except Exception as e:
         logger.error("Error while searching regulations: %s", str(e))
         raise HTTPException(status_code=500, detail="Error during search operation.")
 
-def generate_response_with_ollama(contexts, query):
-    context_text = " ".join(contexts)
-    input_text = f"""
-    Anda adalah chatbot untuk seseorang bertanya mengenai informasi yang telah disediakan di Database Qdrant.
-    Teks informasi di bawah ini adalah hasil pencarian yang relevan dengan pertanyaan yang diajukan, namun mungkin tidak tersusun dengan baik.
-    Tugas Anda adalah menyusun ulang informasi ini secara koheren dan menjawab pertanyaan dengan lengkap dan jelas.
-    
-    {context_text}
-    
-    Setelah Anda membaca teks informasi tersebut, jawablah pertanyaan berikut dengan lengkap sesuai pertanyaannya:
-    Jika teks informasi yang diberikan tidak ada atau kosong, maka Anda jawab "Saya tidak memiliki jawaban berdasarkan informasi yang tersedia", jangan mengarang jawaban dan memunculkan jawaban yang tidak relevan.
-    Pertanyaan: {query}
-    
-    Jika Anda dapat menemukan jawaban berdasarkan teks informasi tersebut, berikan jawaban yang lengkap dengan susunan yang jelas dan koheren, tidak perlu menambahkan jawaban tambahan lainnya.
-    Jika Anda tidak dapat menemukan jawaban yang tepat, katakan bahwa "Saya tidak memiliki jawaban berdasarkan informasi yang tersedia", jangan mengarang jawaban dan memunculkan jawaban yang tidak relevan.
-    Jawablah sesuai dengan Bahasa yang digunakan di query.
-    """
+# Menghasilkan potongan jawaban dari Ollama satu per satu segera setelah diterima. messages berisi riwayat
+# percakapan dan pesan user terakhir; system prompt selalu sama agar prefix prompt bisa dipakai ulang oleh Ollama.
+# Slot generasi diambil dari limiter selama stream berjalan; QueueFull/QueueTimeout diteruskan ke pemanggil.
+async def stream_response_with_ollama(messages):
+    queue_start = time.perf_counter()
+    async with ollama_limiter.slot():
+        record("queue", time.perf_counter() - queue_start)
+        logger.info("Generating response from Ollama model.")
+        generate_start = time.perf_counter()
+        deadline = None
+        try:
+            response = await ollama_client.chat(
+                model=OLLAMA_MODEL,
+                messages=[{"role": "system", "content": SYSTEM_PROMPT}] + messages,
+                options={"seed": 40, "num_ctx": OLLAMA_NUM_CTX},
+                keep_alive=OLLAMA_KEEP_ALIVE,
+                stream=True
+            )
+
+            async for chunk in response:
+                content = chunk.get('message', {}).get('content', '')
+                if content:
+                    if deadline is None:
+                        deadline = time.monotonic() + OLLAMA_GENERATION_TIMEOUT
+                        LLM_TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - generate_start)
+                    yield content
+                if chunk.get('done'):
+                    # Durasi dari Ollama dalam nanodetik: prompt_eval = memproses prompt, eval = decode jawaban
+                    if chunk.get('prompt_eval_duration'):
+                        record("prompt_eval", chunk['prompt_eval_duration'] / 1e9)
+                    if chunk.get('eval_count') and chunk.get('eval_duration'):
+                        LLM_DECODE_RATE.observe(chunk['eval_count'] / (chunk['eval_duration'] / 1e9))
+                if deadline is not None and time.monotonic() > deadline:
+                    raise asyncio.TimeoutError(f"Generasi melebihi {OLLAMA_GENERATION_TIMEOUT} detik")
+        finally:
+            record("generate", time.perf_counter() - generate_start)
 
+    logger.info("Response generated successfully.")
+
+async def generate_response_with_ollama(messages):
     try:
-        logger.info("Generating response from Ollama model.")
-        response = ollama_client.chat(
-            model="llama3.1",
-            messages=[
-                {"role": "system", "content": "Jawablah pertanyaan berdasarkan informasi berikut. Jika tidak ada informasi yang relevan, katakan 'Saya tidak memiliki jawaban berdasarkan informasi yang tersedia', jangan mengarang jawaban dan memunculkan jawaban yang tidak relevan."},
-                {"role": "user", "content": input_text},
-            ],
-            options={"seed":40},
-            stream=True
-        )
-        
-        output = ""
-        for chunk in response:
-            output += chunk.get('message', {}).get('content', '')
+        return "".join([token async for token in stream_response_with_ollama(messages)])
+
+    except QueueFull as e:
+        logger.warning("Generation rejected: %s", str(e))
+        raise HTTPException(status_code=429, detail=str(e))
+
+    except QueueTimeout as e:
+        logger.warning("Generation timed out in queue: %s", str(e))
+        raise HTTPException(status_code=503, detail=str(e))
 
-        logger.info("Response generated successfully.")
-        return output
+    except asyncio.TimeoutError as e:
+        logger.error("Generation timed out: %s", str(e))
+        raise HTTPException(status_code=504, detail="Response generation timed out.")
 
     except Exception as e:
         logger.error("Error while generating response with Ollama: %s", str(e))
         raise HTTPException(status_code=500, detail="Error during response generation.")
 
+@app.on_event("startup")
+async def warmup_models():
+    if remote_embedder is None:
+        registry.warmup_in_background(["embedding"])
+
+@app.on_event("shutdown")
+async def close_clients():
+    await client_qdrant.close()
+    if remote_embedder is not None:
+        await remote_embedder.close()
+    query_batcher.close()
+
 @app.get("/")
 async def read_root():
     logger.info("Root endpoint accessed.")
     return {"message": "Welcome to LLM API"}
 
+@app.get("/health")
+async def health():
+    if remote_embedder is not None:
+        embedding = await remote_embedder.status()
+        status = {"ready": bool(embedding.get("ready")), "embedding_url": EMBEDDING_URL, "embedding": embedding}
+    else:
+        status = registry.status(["embedding"])
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {"query_embedding": embedding_cache.stats(), "answer": answer_cache.stats()}
+
+@app.get("/embedding/stats")
+async def embedding_stats():
+    if remote_embedder is not None:
+        return {"url": EMBEDDING_URL}
+    return query_batcher.stats()
+
+@app.get("/limiter/stats")
+async def limiter_stats():
+    return ollama_limiter.stats()
+
+@app.get("/sessions/stats")
+async def sessions_stats():
+    return session_store.stats()
+
+# Dipanggil frontend saat sesi chat berakhir agar riwayatnya tidak menunggu TTL
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    return {"removed": session_store.remove(session_id)}
+
+# Dipanggil oleh service Qdrant setelah collection diperbarui agar jawaban dan konteks lama tidak dipakai lagi
+@app.post("/cache/invalidate")
+async def invalidate_cache():
+    cleared = answer_cache.invalidate()
+    session_store.clear_contexts()
+    logger.info("Answer cache invalidated, %d entries cleared.", cleared)
+    return {"cleared": cleared}
+
+# Menyiapkan jawaban untuk satu pertanyaan. Mengembalikan (jawaban_cache, messages, finish):
+# - jawaban_cache: jawaban dari cache semantik (hanya untuk pertanyaan yang berdiri sendiri), selain itu None
+# - messages: riwayat sesi + pesan user untuk Ollama, None jika tidak ada konteks yang relevan
+# - finish(jawaban): dipanggil dengan jawaban lengkap untuk mengisi cache jawaban dan riwayat sesi
+async def prepare_answer(prompt, session_id=None):
+    session = session_store.get(session_id) if session_id else None
+    generation = answer_cache.generation
+    query_vector = await get_embeddings(prompt)
+
+    # Pertanyaan tanpa riwayat tidak bergantung pada giliran sebelumnya sehingga boleh memakai cache jawaban
+    standalone = session is None or not session.turns
+    if standalone:
+        cached_answer, similarity = answer_cache.lookup(query_vector)
+        if cached_answer is not None:
+            logger.info("Answer served from cache (similarity %.4f).", similarity)
+            if session is not None:
+                session_store.add_turn(session, prompt, prompt, cached_answer)
+                SESSION_TURNS.inc(context="cache")
+            return cached_answer, None, None
+
+    # Pertanyaan lanjutan yang masih satu topik memakai konteks yang sudah ada di riwayat
+    similarity = session.similarity(query_vector) if session is not None else None
+    reused = similarity is not None and similarity >= SESSION_REUSE_THRESHOLD
+    contexts, topic_vector = None, None
+    if reused:
+        logger.info("Reusing session contexts (similarity %.4f).", similarity)
+        message = build_followup_prompt(prompt)
+    else:
+        # Pertanyaan lanjutan yang pendek dicari bersama pertanyaan sebelumnya agar topiknya tidak hilang
+        retrieval_query, topic_vector = prompt, query_vector
+        if session is not None and session.last_question and is_short_followup(prompt):
+            retrieval_query = f"{session.last_question} {prompt}"
+            topic_vector = await get_embeddings(retrieval_query)
+        contexts = await search_peraturan(retrieval_query, topic_vector)
+        if not contexts:
+            return None, None, None
+        message = build_prompt(contexts, prompt)
+    if session is not None:
+        SESSION_TURNS.inc(context="reused" if reused else "retrieved")
+
+    messages = (session.history() if session is not None else []) + [{"role": "user", "content": message}]
+
+    def finish(answer):
+        if standalone:
+            answer_cache.put(normalize_query(prompt), query_vector, answer, generation)
+        if session is not None:
+            session_store.add_turn(session, prompt, message, answer, contexts, topic_vector, reused=reused)
+
+    return None, messages, finish
+
 @app.post("/ask")
 async def ask_question(query: QueryModel):
     try:
-        logger.info("Received query: %s", query.prompt)
-        results = search_peraturan(query.prompt)
+        logger.info("Received query (%d chars)", len(query.prompt))
+        cached_answer, messages, finish = await prepare_answer(query.prompt, query.session_id)
+        if cached_answer is not None:
+            return {"results": cached_answer}
         
-        if not results:
+        if not messages:
             logger.info("No relevant results found.")
             return {"results": "No relevant results found."}
         
-        response = generate_response_with_ollama(results, query.prompt)
+        response = await generate_response_with_ollama(messages)
+        finish(response)
         return {"results": response}
     
+    except HTTPException:
+        raise
+
     except Exception as e:
         logger.error("Error processing query: %s", str(e))
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Versi streaming dari /ask dalam format NDJSON: satu baris {"token": ...} per potongan jawaban, diakhiri
+# {"done": true, "cached": ...}. Error setelah streaming dimulai dikirim sebagai baris {"error": ...}.
+# Jika antrean generasi sudah penuh, request langsung ditolak dengan 429 sebelum streaming dimulai.
+@app.post("/ask/stream")
+async def ask_question_stream(query: QueryModel):
+    try:
+        logger.info("Received streaming query (%d chars)", len(query.prompt))
+        cached_answer, messages, finish = await prepare_answer(query.prompt, query.session_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error processing query: %s", str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+    def ndjson(data):
+        return json.dumps(data) + "\n"
+
+    if cached_answer is None and messages:
+        try:
+            ollama_limiter.admit_or_raise()
+        except QueueFull as e:
+            logger.warning("Generation rejected: %s", str(e))
+            raise HTTPException(status_code=429, detail=str(e))
+
+    async def stream():
+        if cached_answer is not None:
+            yield ndjson({"token": cached_answer})
+            yield ndjson({"done": True, "cached": True})
+            return
+        if not messages:
+            logger.info("No relevant results found.")
+            yield ndjson({"token": "No relevant results found."})
+            yield ndjson({"done": True, "cached": False})
+            return
+
+        tokens = []
+        try:
+            async for token in stream_response_with_ollama(messages):
+                tokens.append(token)
+                yield ndjson({"token": token})
+        except (QueueFull, QueueTimeout, asyncio.TimeoutError) as e:
+            logger.warning("Streaming generation aborted: %s", str(e))
+            yield ndjson({"error": str(e)})
+            return
+        except Exception as e:
+            logger.error("Error while generating response with Ollama: %s", str(e))
+            yield ndjson({"error": "Error during response generation."})
+            return
+        finish("".join(tokens))
+        yield ndjson({"done": True, "cached": False})
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
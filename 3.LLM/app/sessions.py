@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from rag_common.chunking import estimate_tokens
+
+# Status percakapan per sesi chat: giliran terakhir (pesan user persis seperti yang dikirim ke Ollama beserta
+# jawabannya) dan konteks hasil pencarian terakhir. Riwayat dikirim ulang ke Ollama sebagai prefix yang sama
+# persis di setiap giliran sehingga KV cache model bisa dipakai ulang; pertanyaan lanjutan yang masih satu topik
+# memakai konteks yang sudah ada di riwayat tanpa pencarian Qdrant dan tanpa mengirim ulang konteks.
+# Memori dibatasi jumlah sesi (LRU), TTL sejak dipakai terakhir, dan anggaran token riwayat per sesi.
+SESSION_TTL = int(os.getenv("SESSION_TTL", "1800"))  # Detik sejak giliran terakhir
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "6"))
+SESSION_HISTORY_TOKEN_BUDGET = int(os.getenv("SESSION_HISTORY_TOKEN_BUDGET", "4000"))  # Perkiraan token riwayat
+SESSION_REUSE_THRESHOLD = float(os.getenv("SESSION_REUSE_THRESHOLD", "0.75"))  # Cosine ke topik konteks terakhir
+SESSION_FOLLOWUP_MAX_WORDS = int(os.getenv("SESSION_FOLLOWUP_MAX_WORDS", "8"))  # Pertanyaan sependek ini dianggap lanjutan
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+# Pertanyaan pendek seperti "bagaimana kalau sakit?" biasanya bergantung pada pertanyaan sebelumnya
+def is_short_followup(question, max_words=SESSION_FOLLOWUP_MAX_WORDS):
+    return len(question.split()) <= max_words
+
+class Session:
+    def __init__(self, session_id, now):
+        self.id = session_id
+        self.turns = []  # dict: question, message (pesan user ke Ollama), answer, has_contexts, tokens
+        self.contexts = []  # Konteks yang sedang ada di riwayat
+        self.topic_vector = None  # Vektor query yang dipakai untuk mencari konteks tersebut
+        self.created = now
+        self.last_used = now
+
+    @property
+    def last_question(self):
+        return self.turns[-1]["question"] if self.turns else None
+
+    @property
+    def tokens(self):
+        return sum(turn["tokens"] for turn in self.turns)
+
+    # Riwayat dalam format pesan chat Ollama, urutan dan isi sama persis dengan giliran sebelumnya
+    def history(self):
+        messages = []
+        for turn in self.turns:
+            messages.append({"role": "user", "content": turn["message"]})
+            messages.append({"role": "assistant", "content": turn["answer"]})
+        return messages
+
+    # Cosine similarity query baru terhadap topik konteks di riwayat, None jika tidak ada konteks
+    def similarity(self, vector):
+        if self.topic_vector is None or not self.contexts:
+            return None
+        return float(self.topic_vector @ _unit(vector))
+
+class SessionStore:
+    def __init__(self, max_sessions=SESSION_MAX_SESSIONS, ttl=SESSION_TTL, max_turns=SESSION_MAX_TURNS,
+                 token_budget=SESSION_HISTORY_TOKEN_BUDGET):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self.reused_turns = 0
+        self.retrieved_turns = 0
+
+    def _expire(self, now):
+        if not self.ttl:
+            return
+        # Sesi terurut dari yang paling lama tidak dipakai
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used < self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+
+    # Mengambil sesi (dibuat jika belum ada atau sudah kedaluwarsa)
+    def get(self, session_id):
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session(session_id, now)
+                self.created += 1
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evicted += 1
+            self._sessions.move_to_end(session_id)
+            session.last_used = now
+            return session
+
+    def remove(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    # Menyimpan satu giliran. contexts diisi jika giliran ini mengambil konteks baru (pesan berisi konteks);
+    # reused menandai giliran yang menjawab dengan konteks yang sudah ada di riwayat.
+    def add_turn(self, session, question, message, answer, contexts=None, topic_vector=None, reused=False):
+        with self._lock:
+            session.turns.append({"question": question, "message": message, "answer": answer,
+                                  "has_contexts": contexts is not None,
+                                  "tokens": estimate_tokens(message) + estimate_tokens(answer)})
+            if contexts is not None:
+                session.contexts = list(contexts)
+                session.topic_vector = _unit(topic_vector)
+                self.retrieved_turns += 1
+            elif reused:
+                self.reused_turns += 1
+            # Giliran terlama dibuang lebih dulu; giliran terakhir selalu disimpan
+            while len(session.turns) > 1 and (len(session.turns) > self.max_turns
+                                              or session.tokens > self.token_budget):
+                session.turns.pop(0)
+            # Konteks hanya bisa dipakai ulang selama pesan yang memuatnya masih ada di riwayat
+            if not any(turn["has_contexts"] for turn in session.turns):
+                session.contexts = []
+                session.topic_vector = None
+            session.last_used = time.time()
+
+    # Dipanggil saat collection berubah: konteks lama tidak dipakai ulang, riwayat percakapan tetap
+    def clear_contexts(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.contexts = []
+                session.topic_vector = None
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.time())
+            return {"sessions": len(self._sessions), "max_sessions": self.max_sessions, "ttl": self.ttl,
+                    "turns": sum(len(s.turns) for s in self._sessions.values()),
+                    "history_tokens": sum(s.tokens for s in self._sessions.values()),
+                    "created": self.created, "expired": self.expired, "evicted": self.evicted,
+                    "reused_turns": self.reused_turns, "retrieved_turns": self.retrieved_turns}
+
+session_store = SessionStore()
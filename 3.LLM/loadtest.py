@@ -0,0 +1,154 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+import httpx
+
+# Load test untuk service LLM: menjalankan N pengguna bersamaan yang masing-masing mengirim beberapa pertanyaan
+# berurutan, lalu melaporkan latensi p50/p95 (dan time-to-first-token untuk /ask/stream) per tingkat konkurensi.
+# Jalankan: python loadtest.py http://localhost:8003 --users 1 10 50 --requests-per-user 5 [--stream]
+# Simulasi pengguna chat seperti frontend Chainlit (satu sesi per pengguna, jeda "berpikir" acak antar pesan):
+#   python loadtest.py http://localhost:8003 --users 20 --requests-per-user 5 --stream --session --think-time 2 --ramp-up 10
+# --no-pool meniru klien lama (satu koneksi baru per pesan) untuk dibandingkan dengan klien bersama.
+
+DEFAULT_PROMPTS = [
+    "Berapa hari jatah cuti tahunan karyawan?",
+    "Jam kerja kantor mulai pukul berapa?",
+    "Kapan gaji dibayarkan setiap bulan?",
+    "Bagaimana prosedur pengajuan izin sakit?",
+    "Apa sanksi jika karyawan terlambat masuk kerja?",
+]
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(p / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+class Results:
+    def __init__(self):
+        self.latencies = []
+        self.ttfts = []
+        self.errors = []
+        self.tokens = 0
+
+async def ask(client, url, prompt, stream, session_id=None):
+    start = time.perf_counter()
+    first_token = None
+    tokens = 0
+    payload = {"prompt": prompt, "session_id": session_id}
+    headers = {"X-Request-ID": f"loadtest-{uuid.uuid4().hex[:12]}"}
+    if not stream:
+        response = await client.post(f"{url}/ask", json=payload, headers=headers)
+        response.raise_for_status()
+        return time.perf_counter() - start, None, 0
+    async with client.stream("POST", f"{url}/ask/stream", json=payload, headers=headers) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if "error" in event:
+                raise RuntimeError(event["error"])
+            if "token" in event:
+                tokens += 1
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+    return time.perf_counter() - start, first_token, tokens
+
+# Satu pengguna: dengan --session setiap pengguna punya session_id sendiri (seperti satu sesi chat di Chainlit)
+# sehingga pertanyaan berikutnya memakai riwayat percakapannya; sesi dihapus setelah pengguna selesai.
+async def user(index, shared_client, args, users, prompts, results):
+    rng = random.Random(args.seed + index)
+    session_id = uuid.uuid4().hex if args.session else None
+    await asyncio.sleep(args.ramp_up * index / max(users, 1))
+    for request in range(args.requests_per_user):
+        if request and args.think_time > 0:
+            await asyncio.sleep(rng.expovariate(1 / args.think_time))
+        prompt = rng.choice(prompts)
+        try:
+            if shared_client is not None:
+                latency, ttft, tokens = await ask(shared_client, args.url, prompt, args.stream, session_id)
+            else:
+                async with httpx.AsyncClient(timeout=args.timeout) as client:
+                    latency, ttft, tokens = await ask(client, args.url, prompt, args.stream, session_id)
+        except Exception as e:
+            results.errors.append(f"{type(e).__name__}: {e}")
+            continue
+        results.latencies.append(latency)
+        results.tokens += tokens
+        if ttft is not None:
+            results.ttfts.append(ttft)
+    if session_id is not None:
+        try:
+            async with httpx.AsyncClient(timeout=args.timeout) as client:
+                await client.delete(f"{args.url}/sessions/{session_id}")
+        except httpx.HTTPError:
+            pass
+
+async def run_level(args, users, prompts):
+    results = Results()
+    shared_client = None
+    if not args.no_pool:
+        limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+        shared_client = httpx.AsyncClient(timeout=args.timeout, limits=limits)
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(user(i, shared_client, args, users, prompts, results) for i in range(users)))
+    finally:
+        if shared_client is not None:
+            await shared_client.aclose()
+    elapsed = time.perf_counter() - start
+    return {"users": users, "requests": len(results.latencies) + len(results.errors), "errors": len(results.errors),
+            "seconds": round(elapsed, 2), "throughput": round(len(results.latencies) / elapsed, 2),
+            "tokens_per_second": round(results.tokens / elapsed, 1),
+            "p50": percentile(results.latencies, 50), "p95": percentile(results.latencies, 95),
+            "ttft_p50": percentile(results.ttfts, 50), "ttft_p95": percentile(results.ttfts, 95),
+            "pooled": not args.no_pool, "sample_error": results.errors[0] if results.errors else None}
+
+def fmt(value):
+    return f"{value:.2f}" if value is not None else "-"
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test endpoint /ask service LLM")
+    parser.add_argument("url", help="Base URL service LLM, mis. http://localhost:8003")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--requests-per-user", type=int, default=5)
+    parser.add_argument("--stream", action="store_true", help="Pakai /ask/stream dan ukur time-to-first-token")
+    parser.add_argument("--session", action="store_true", help="Session_id berbeda untuk setiap pengguna")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Rata-rata jeda antar pertanyaan (detik)")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Detik sampai semua pengguna aktif")
+    parser.add_argument("--no-pool", action="store_true", help="Klien (koneksi) baru untuk setiap pertanyaan")
+    parser.add_argument("--prompts", help="File berisi satu pertanyaan per baris")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Cetak hasil sebagai JSON")
+    args = parser.parse_args()
+    args.url = args.url.rstrip("/")
+
+    prompts = DEFAULT_PROMPTS
+    if args.prompts:
+        with open(args.prompts, encoding="utf-8") as file:
+            prompts = [line.strip() for line in file if line.strip()]
+
+    results = []
+    if not args.json:
+        print(f"{'users':>5} {'request':>7} {'error':>5} {'req/detik':>9} {'token/detik':>11} {'p50':>7} {'p95':>7} "
+              f"{'ttft p50':>8} {'ttft p95':>8}")
+    for users in args.users:
+        result = asyncio.run(run_level(args, users, prompts))
+        results.append(result)
+        if not args.json:
+            print(f"{users:>5} {result['requests']:>7} {result['errors']:>5} {result['throughput']:>9.2f} "
+                  f"{result['tokens_per_second']:>11.1f} {fmt(result['p50']):>7} {fmt(result['p95']):>7} "
+                  f"{fmt(result['ttft_p50']):>8} {fmt(result['ttft_p95']):>8}")
+            if result["sample_error"]:
+                print(f"      contoh error: {result['sample_error']}")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,153 @@
 import chainlit as cl
-import requests
+import httpx
+import asyncio
 import logging
 import json
+import os
+import time
+import uuid
 
-# Setup logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+# Setup logging (level lewat LOG_LEVEL, default INFO); isi pertanyaan dan jawaban tidak ditulis ke log
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(),
+                    format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# URL untuk endpoint model LLM Anda
-LLM_API_URL = "http://10.12.9.105:8003/ask"
+# Header request id yang diteruskan ke service LLM dan tercetak di log kedua sisi
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Koneksi ke service LLM (bisa diubah lewat environment variable). Satu klien async dipakai bersama oleh semua
+# sesi chat sehingga koneksi TCP ke service LLM dipakai ulang dan tidak ada request yang memblokir event loop.
+LLM_API_URL = os.getenv("LLM_API_URL", "http://llm_api:8003").rstrip("/")
+LLM_STREAM_PATH = "/ask/stream"  # Jawaban dikirim bertahap dalam format NDJSON
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))  # Detik untuk membuka koneksi
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "300"))  # Detik maksimal jeda antar potongan jawaban
+LLM_POOL_TIMEOUT = float(os.getenv("LLM_POOL_TIMEOUT", "30"))  # Detik menunggu koneksi kosong dari pool
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))  # Koneksi idle yang disimpan untuk dipakai ulang
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))  # Percobaan ulang sebelum token pertama diterima
+LLM_RETRY_DELAY = float(os.getenv("LLM_RETRY_DELAY", "0.5"))  # Detik, dilipatgandakan tiap percobaan
+LLM_SESSION_MAX_CONCURRENT = int(os.getenv("LLM_SESSION_MAX_CONCURRENT", "1"))  # Pertanyaan aktif per sesi chat
+
+# Status yang aman diulang karena service LLM menolak sebelum jawaban mulai dibuat (antrean penuh/timeout antrean)
+RETRY_STATUS = {429, 502, 503}
+
+_client = None
+
+# Klien dibuat sekali saat aplikasi mulai; dibuat ulang jika belum ada atau sudah ditutup
+def get_client():
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=LLM_API_URL,
+            timeout=httpx.Timeout(LLM_CONNECT_TIMEOUT, read=LLM_READ_TIMEOUT, pool=LLM_POOL_TIMEOUT),
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE),
+            # Koneksi yang gagal dibuka dicoba ulang oleh transport sebelum masuk ke retry di bawah
+            transport=httpx.AsyncHTTPTransport(retries=1),
+        )
+    return _client
+
+@cl.on_app_startup
+async def create_client():
+    get_client()
+
+@cl.on_app_shutdown
+async def close_client():
+    if _client is not None:
+        await _client.aclose()
+
+# Riwayat percakapan di service LLM dihapus saat sesi chat berakhir (sisanya dibersihkan oleh TTL di sana)
+@cl.on_chat_end
+async def end_session():
+    session_id = cl.user_session.get("id")
+    try:
+        await get_client().delete(f"/sessions/{session_id}")
+    except httpx.HTTPError as e:
+        logger.warning("Failed to remove LLM session: %s", str(e))
+
+def retry_delay(attempt, response=None):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return LLM_RETRY_DELAY * 2 ** attempt
+
+# Mengirim pertanyaan ke /ask/stream dan menghasilkan event NDJSON satu per satu.
+# Request hanya diulang selama belum ada jawaban yang diterima, sehingga token tidak pernah terkirim dua kali.
+async def stream_events(payload, headers):
+    for attempt in range(LLM_RETRIES + 1):
+        try:
+            async with get_client().stream("POST", LLM_STREAM_PATH, json=payload, headers=headers) as response:
+                if response.status_code in RETRY_STATUS and attempt < LLM_RETRIES:
+                    delay = retry_delay(attempt, response)
+                    logger.warning("[%s] LLM returned %d, retrying in %.1fs", headers[REQUEST_ID_HEADER],
+                                   response.status_code, delay)
+                else:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if line:
+                            yield json.loads(line)
+                    return
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+            if attempt == LLM_RETRIES:
+                raise
+            delay = retry_delay(attempt)
+            logger.warning("[%s] LLM unreachable (%s), retrying in %.1fs", headers[REQUEST_ID_HEADER], e, delay)
+        await asyncio.sleep(delay)
 
 @cl.on_message
 async def main(message: cl.Message):
     # Ambil isi pesan dari objek Message
     message_content = message.content
-    logger.info("Received message content: %s", message_content)
+    request_id = uuid.uuid4().hex[:16]
+    logger.info("[%s] Received message (%d chars)", request_id, len(message_content))
 
-    # Buat payload untuk mengirimkan pertanyaan ke model LLM
-    payload = {"prompt": message_content}
-    logger.debug("Payload to LLM: %s", payload)
+    # Buat payload untuk mengirimkan pertanyaan ke model LLM; session_id membuat service LLM memakai riwayat
+    # percakapan sesi ini untuk pertanyaan lanjutan
+    payload = {"prompt": message_content, "session_id": cl.user_session.get("id")}
+    headers = {REQUEST_ID_HEADER: request_id}
 
-    try:
-        # Kirim permintaan POST ke model LLM
-        response = requests.post(LLM_API_URL, json=payload)
-
-        # Periksa apakah permintaan berhasil
-        if response.status_code == 200:
-            # Ambil respons dari model LLM
-            llm_response = response.json().get("results", "Tidak ada jawaban yang tersedia.")
-            logger.info("LLM Response: %s", llm_response)
-        else:
-            llm_response = f"Error: Model LLM mengembalikan status code {response.status_code}"
-            logger.error("Failed to get response from LLM. Status code: %d", response.status_code)
-
-    except requests.exceptions.RequestException as e:
-        llm_response = f"Error: Tidak dapat menghubungi model LLM. Detail: {str(e)}"
-        logger.error("Exception occurred while sending request to LLM: %s", str(e))
-
-    # Log response content
-    logger.debug("Sending response to Chainlit: %s", llm_response)
-
-    # Kirim balasan ke Chainlit
-    await cl.Message(content=llm_response).send()
\ No newline at end of file
+    # Pesan balasan ditampilkan segera dan diisi potongan jawaban begitu diterima
+    reply = cl.Message(content="")
+    received_tokens = False
+
+    # Pertanyaan berikutnya dari sesi yang sama menunggu sampai slot sesi tersedia (dibuat saat pesan pertama)
+    slots = cl.user_session.get("llm_slots")
+    if slots is None:
+        slots = asyncio.Semaphore(LLM_SESSION_MAX_CONCURRENT)
+        cl.user_session.set("llm_slots", slots)
+
+    async with slots:
+        start = time.perf_counter()
+        first_token_seconds = None
+        try:
+            async for event in stream_events(payload, headers):
+                if "token" in event:
+                    if first_token_seconds is None:
+                        first_token_seconds = time.perf_counter() - start
+                    received_tokens = True
+                    await reply.stream_token(event["token"])
+                elif "error" in event:
+                    logger.error("[%s] LLM stream error: %s", request_id, event["error"])
+                    await reply.stream_token(f"\n\nError: {event['error']}")
+                elif event.get("done"):
+                    logger.info("[%s] LLM response streamed (cached: %s, first token %.0f ms, total %.0f ms)",
+                                request_id, event.get("cached"), (first_token_seconds or 0) * 1000,
+                                (time.perf_counter() - start) * 1000)
+
+        except httpx.HTTPStatusError as e:
+            logger.error("[%s] Failed to get response from LLM. Status code: %d", request_id,
+                         e.response.status_code)
+            reply.content = f"Error: Model LLM mengembalikan status code {e.response.status_code}"
+
+        except httpx.HTTPError as e:
+            logger.error("[%s] Exception occurred while sending request to LLM: %s", request_id, str(e))
+            error_message = f"Error: Tidak dapat menghubungi model LLM. Detail: {str(e)}"
+            if received_tokens:
+                await reply.stream_token(f"\n\n{error_message}")
+            else:
+                reply.content = error_message
+
+    if not received_tokens and not reply.content:
+        reply.content = "Tidak ada jawaban yang tersedia."
+
+    # Kirim balasan ke Chainlit (menyelesaikan pesan yang sedang di-stream)
+    await reply.send()
@@ -0,0 +1,337 @@
+import argparse
+import asyncio
+import hashlib
+import importlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+
+# Benchmark end-to-end pipeline RAG: PDF sintetis -> OCR (perform_ocr) -> indexing (update_collection) ->
+# pencarian (search_peraturan) -> /ask. Semua berjalan dalam satu proses: Qdrant memakai mode :memory: dan
+# Ollama diganti server palsu yang men-stream token dengan laju tetap. Hasil berupa JSON berisi throughput,
+# persentil latensi, dan puncak RSS per tahap, bisa dibandingkan dengan hasil versi sebelumnya lewat --compare.
+# Jalankan dari root repo: python benchmarks/e2e.py --documents 3 --pages 3 --output hasil.json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_ollama import FakeOllama  # noqa: E402
+from synthetic import generate  # noqa: E402
+
+PERCENTILES = (50, 90, 95, 99)
+
+def latency_summary(seconds):
+    if not seconds:
+        return None
+    values = np.array(seconds) * 1000
+    summary = {f"p{p}": round(float(np.percentile(values, p)), 2) for p in PERCENTILES}
+    summary.update(mean=round(float(values.mean()), 2), max=round(float(values.max()), 2))
+    return summary
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# Mengukur puncak RSS selama satu tahap dengan sampling di thread latar
+class PeakRSS:
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_mb())
+
+# Setiap service punya package "app" sendiri; modul service dimuat bergantian dengan membersihkan sys.modules
+def load_service(directory, module):
+    for name in [n for n in sys.modules if n == "app" or n.startswith("app.")]:
+        del sys.modules[name]
+    path = os.path.join(ROOT, directory)
+    sys.path.insert(0, path)
+    try:
+        return importlib.import_module(module)
+    finally:
+        sys.path.remove(path)
+
+# Embedding deterministik tanpa model, untuk mengukur overhead pipeline di mesin tanpa model/GPU
+class FakeEmbeddingModel:
+    class Tokenizer:
+        def tokenize(self, text):
+            return text.split()
+
+    tokenizer = Tokenizer()
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        single = isinstance(texts, str)
+        vectors = []
+        for text in [texts] if single else texts:
+            seed = int.from_bytes(hashlib.sha256(text.lower().encode()).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(768).astype(np.float32)
+            vectors.append(vector / np.linalg.norm(vector))
+        return vectors[0] if single else np.stack(vectors)
+
+    def start_multi_process_pool(self, *args):
+        return None
+
+# Klien Qdrant async untuk service LLM yang meneruskan ke klien :memory: sinkron yang sama dengan tahap indexing
+class AsyncClientAdapter:
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+def stage_ocr(docs, result_dir, skip_ocr):
+    os.makedirs(result_dir, exist_ok=True)
+    page_latencies, pages, keywords_found, keywords_total = [], 0, 0, 0
+    start = time.perf_counter()
+    if skip_ocr:
+        for doc in docs:
+            with open(os.path.join(result_dir, f"hasil_{doc['name']}.txt"), "w", encoding="utf-8") as file:
+                file.write(doc["text"])
+            pages += doc["pages"]
+        return {"skipped": True, "items": pages, "seconds": round(time.perf_counter() - start, 3)}
+
+    ocr = load_service("1.OCR", "app.ocr")
+    for doc in docs:
+        output_path = os.path.join(result_dir, f"hasil_{doc['name']}.txt")
+        last = [time.perf_counter()]
+
+        def progress(done, total):
+            now = time.perf_counter()
+            if done:
+                page_latencies.append(now - last[0])
+            last[0] = now
+
+        result = ocr.perform_ocr(doc["pdf"], output_path, progress=progress)
+        pages += result["pages"]
+        with open(result["output_file"], encoding="utf-8") as file:
+            text = file.read().lower()
+        for paragraph in doc["text"].split("\f"):
+            for line in paragraph.split("\n\n"):
+                if line.startswith("Pasal"):
+                    keywords_total += 1
+                    keywords_found += line.split(".")[0].lower() in text
+    elapsed = time.perf_counter() - start
+    return {"items": pages, "seconds": round(elapsed, 3), "throughput": round(pages / elapsed, 3),
+            "unit": "pages/s", "latency_ms": latency_summary(page_latencies),
+            "article_recall": round(keywords_found / keywords_total, 4) if keywords_total else None}
+
+def stage_index(qdrant, result_dir):
+    start = time.perf_counter()
+    stats = qdrant.update_collection(result_dir)
+    elapsed = time.perf_counter() - start
+    points = stats["points_upserted"]
+    return {"items": points, "seconds": round(elapsed, 3), "throughput": round(points / elapsed, 3),
+            "unit": "chunks/s", "files": stats["files_added"]}
+
+def stage_search(qdrant, questions):
+    latencies, hits = [], 0
+    start = time.perf_counter()
+    for question in questions:
+        query_start = time.perf_counter()
+        results = qdrant.search_peraturan(question["question"])
+        latencies.append(time.perf_counter() - query_start)
+        hits += any(question["expected"] in text and question["topic"] in text.lower() for text in results)
+    elapsed = time.perf_counter() - start
+    return {"items": len(questions), "seconds": round(elapsed, 3), "throughput": round(len(questions) / elapsed, 3),
+            "unit": "queries/s", "latency_ms": latency_summary(latencies),
+            "hit_rate": round(hits / len(questions), 4) if questions else None}
+
+# /ask/stream dipanggil langsung lewat antarmuka ASGI (httpx.ASGITransport menampung seluruh body sebelum
+# mengembalikan respons) sehingga waktu token pertama terukur saat token benar-benar dikirim aplikasi
+async def ask_stream(app, prompt):
+    body = json.dumps({"prompt": prompt}).encode()
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+             "path": "/ask/stream", "raw_path": b"/ask/stream", "query_string": b"", "root_path": "",
+             "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+             "client": ("127.0.0.1", 0), "server": ("llm", 80)}
+    received = False
+    start = time.perf_counter()
+    first_token, error, buffer = None, False, b""
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()  # Klien tidak pernah memutus koneksi
+
+    async def send(message):
+        nonlocal first_token, error, buffer
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            error = True
+        elif message["type"] == "http.response.body":
+            buffer += message.get("body", b"")
+            *lines, buffer = buffer.split(b"\n")
+            for line in filter(None, lines):
+                event = json.loads(line)
+                error = error or "error" in event
+                if "token" in event and first_token is None:
+                    first_token = time.perf_counter() - start
+
+    await app(scope, receive, send)
+    return time.perf_counter() - start, first_token, error
+
+async def _ask_all(llm, questions, concurrency):
+    latencies, first_tokens, errors = [], [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def ask(question):
+        nonlocal errors
+        async with semaphore:
+            latency, first_token, error = await ask_stream(llm.app, question["question"])
+        latencies.append(latency)
+        errors += error
+        if first_token is not None:
+            first_tokens.append(first_token)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(ask(question) for question in questions))
+    return latencies, first_tokens, errors, time.perf_counter() - start
+
+def stage_ask(llm, questions, concurrency):
+    latencies, first_tokens, errors, elapsed = asyncio.run(_ask_all(llm, questions, concurrency))
+    return {"items": len(questions), "seconds": round(elapsed, 3), "throughput": round(len(questions) / elapsed, 3),
+            "unit": "answers/s", "concurrency": concurrency, "errors": errors,
+            "latency_ms": latency_summary(latencies), "ttft_ms": latency_summary(first_tokens),
+            "answer_cache": llm.answer_cache.stats()}
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Membandingkan dengan hasil sebelumnya: throughput turun atau p95 naik lebih dari toleransi dianggap regresi
+def compare(results, baseline, tolerance):
+    regressions = []
+    for stage, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous or current.get("skipped") or previous.get("skipped"):
+            continue
+        if previous.get("throughput") and current.get("throughput", 0) < previous["throughput"] * (1 - tolerance):
+            regressions.append(f"{stage}: throughput {previous['throughput']} -> {current['throughput']}")
+        for key in ("latency_ms", "ttft_ms"):
+            old, new = (previous.get(key) or {}).get("p95"), (current.get(key) or {}).get("p95")
+            if old and new and new > old * (1 + tolerance):
+                regressions.append(f"{stage}: {key} p95 {old} -> {new}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end OCR -> indexing -> pencarian -> /ask")
+    parser.add_argument("--documents", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--articles-per-page", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Folder kerja (default: folder sementara baru, cache OCR dingin)")
+    parser.add_argument("--skip-ocr", action="store_true", help="Pakai teks referensi sebagai hasil OCR")
+    parser.add_argument("--fake-embeddings", action="store_true", help="Embedding deterministik tanpa model")
+    parser.add_argument("--ask-concurrency", type=int, default=4)
+    parser.add_argument("--ollama-tokens", type=int, default=64)
+    parser.add_argument("--ollama-rate", type=float, default=50.0, help="Token per detik dari Ollama palsu")
+    parser.add_argument("--ollama-ttft", type=float, default=0.2, help="Detik sebelum token pertama")
+    parser.add_argument("--verbose", action="store_true", help="Tampilkan log INFO dari service")
+    parser.add_argument("--output", help="File JSON hasil (default: stdout)")
+    parser.add_argument("--compare", help="File JSON hasil sebelumnya untuk deteksi regresi")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="rag_bench_")
+    result_dir = os.path.join(workdir, "result_ocr")
+    # Konfigurasi service diatur lewat environment sebelum modulnya dimuat
+    os.environ.update(OCR_CACHE_DIR=os.path.join(workdir, "cache_ocr"), OCR_WORKERS="1", MODEL_WARMUP="0",
+                      QDRANT_MANIFEST_PATH=os.path.join(workdir, "manifest.json"), QDRANT_URL=":memory:",
+                      LLM_CACHE_INVALIDATE_URL="")
+
+    from rag_common.models import registry
+    if args.fake_embeddings:
+        registry.register("embedding", lambda device: FakeEmbeddingModel())
+
+    results = {"revision": git_revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+               "python": platform.python_version(), "machine": platform.machine(), "config": vars(args),
+               "stages": {}}
+    stages = results["stages"]
+    if not args.verbose:
+        logging.disable(logging.INFO)  # Log per request dari service mengganggu pengukuran
+
+    with PeakRSS() as rss:
+        docs, questions = generate(os.path.join(workdir, "pdf"), args.documents, args.pages, args.articles_per_page,
+                                   args.seed)
+    stages["generate"] = {"documents": len(docs), "questions": len(questions), "peak_rss_mb": round(rss.peak, 1)}
+
+    with PeakRSS() as rss:
+        stages["ocr"] = stage_ocr(docs, result_dir, args.skip_ocr)
+    stages["ocr"]["peak_rss_mb"] = round(rss.peak, 1)
+
+    qdrant = load_service("2.Qdrant", "app.qdrant")
+    client = qdrant.client
+    with PeakRSS() as rss:
+        stages["index"] = stage_index(qdrant, result_dir)
+    stages["index"]["peak_rss_mb"] = round(rss.peak, 1)
+
+    with PeakRSS() as rss:
+        stages["search"] = stage_search(qdrant, questions)
+    stages["search"]["peak_rss_mb"] = round(rss.peak, 1)
+
+    fake_ollama = FakeOllama(args.ollama_tokens, args.ollama_rate, args.ollama_ttft).start()
+    try:
+        from ollama import AsyncClient
+        llm = load_service("3.LLM", "app.main")
+        llm.client_qdrant = AsyncClientAdapter(client)
+        llm.ollama_client = AsyncClient(host=fake_ollama.url)
+        with PeakRSS() as rss:
+            stages["ask"] = stage_ask(llm, questions, args.ask_concurrency)
+        stages["ask"]["peak_rss_mb"] = round(rss.peak, 1)
+    finally:
+        fake_ollama.stop()
+
+    results["peak_rss_mb"] = max(stage.get("peak_rss_mb", 0) for stage in stages.values())
+    output = json.dumps(results, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESI {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
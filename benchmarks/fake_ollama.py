@@ -0,0 +1,70 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Server Ollama palsu untuk benchmark: POST /api/chat menjawab dengan stream NDJSON berisi sejumlah token tetap
+# dengan jeda awal (time-to-first-token) dan laju token yang tetap, sehingga waktu generasi bisa diulang persis.
+
+class FakeOllama:
+    def __init__(self, tokens=64, tokens_per_second=50.0, first_token_delay=0.2, host="127.0.0.1", port=0):
+        self.tokens = tokens
+        self.tokens_per_second = tokens_per_second
+        self.first_token_delay = first_token_delay
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path != "/api/chat":
+                    self.send_error(404)
+                    return
+                fake.requests += 1
+                model = body.get("model", "fake")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Connection", "close")
+                self.end_headers()
+
+                def write(content, done):
+                    line = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(),
+                            "message": {"role": "assistant", "content": content}, "done": done}
+                    if done:
+                        line.update(done_reason="stop", eval_count=fake.tokens,
+                                    prompt_eval_duration=int(fake.first_token_delay * 1e9),
+                                    eval_duration=int(fake.tokens / fake.tokens_per_second * 1e9))
+                    self.wfile.write((json.dumps(line) + "\n").encode())
+                    self.wfile.flush()
+
+                time.sleep(fake.first_token_delay)
+                for index in range(fake.tokens):
+                    if index:
+                        time.sleep(1 / fake.tokens_per_second)
+                    write(f"token{index} ", False)
+                write("", True)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
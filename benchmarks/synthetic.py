@@ -0,0 +1,99 @@
+import json
+import os
+import random
+import textwrap
+from PIL import Image, ImageDraw, ImageFont
+
+# Pembuat dokumen peraturan sintetis (PDF hasil scan berupa gambar) beserta daftar pertanyaan dan jawaban
+# yang diharapkan, untuk benchmark end-to-end yang bisa diulang dengan seed yang sama.
+
+PAGE_DPI = 150
+PAGE_SIZE = (1240, 1754)  # A4 pada 150 dpi
+MARGIN = 110
+FONT_SIZE = 28
+LINE_SPACING = 12
+WRAP_WIDTH = 68
+
+TOPICS = [
+    ("cuti tahunan", "Setiap karyawan berhak atas cuti tahunan selama {n} hari kerja setelah bekerja dua belas bulan "
+                     "secara terus menerus.", "Berapa hari cuti tahunan yang diberikan kepada karyawan {company}?"),
+    ("jam kerja", "Jam kerja normal adalah {n} jam per minggu yang dibagi dalam lima hari kerja dari Senin sampai "
+                  "Jumat.", "Berapa jam kerja normal per minggu di {company}?"),
+    ("lembur", "Upah lembur untuk jam pertama dibayar sebesar {n} persen dari upah sejam dan wajib disetujui atasan "
+               "langsung.", "Berapa persen upah lembur jam pertama di {company}?"),
+    ("masa percobaan", "Masa percobaan bagi karyawan baru paling lama {n} bulan dan dapat diakhiri oleh kedua pihak "
+                       "tanpa pesangon.", "Berapa bulan masa percobaan karyawan baru di {company}?"),
+    ("gaji", "Gaji dibayarkan setiap tanggal {n} pada bulan berjalan melalui transfer ke rekening bank karyawan.",
+     "Tanggal berapa gaji dibayarkan di {company}?"),
+    ("cuti melahirkan", "Karyawan perempuan berhak atas cuti melahirkan selama {n} hari dengan tetap menerima upah "
+                        "penuh.", "Berapa hari cuti melahirkan di {company}?"),
+    ("keterlambatan", "Karyawan yang terlambat lebih dari {n} kali dalam satu bulan akan menerima surat peringatan "
+                      "pertama.", "Berapa kali keterlambatan sebelum surat peringatan di {company}?"),
+    ("perjalanan dinas", "Uang harian perjalanan dinas dalam negeri ditetapkan sebesar {n} ribu rupiah per hari "
+                         "termasuk biaya makan.", "Berapa uang harian perjalanan dinas di {company}?"),
+]
+FILLER = ("Ketentuan ini berlaku bagi seluruh karyawan tetap maupun kontrak dan dilaksanakan sesuai dengan "
+          "peraturan perundang-undangan yang berlaku serta kebijakan perusahaan yang ditetapkan oleh direksi.")
+COMPANIES = ["PT Sinar Abadi", "PT Nusantara Jaya", "PT Mitra Sejahtera", "PT Cahaya Baru", "PT Bumi Lestari",
+             "PT Karya Mandiri", "PT Samudra Raya", "PT Tunas Harapan"]
+
+def load_font(size=FONT_SIZE):
+    for name in ("DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "Arial.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+# Membuat isi dokumen: list halaman, setiap halaman list paragraf, beserta fakta yang bisa ditanyakan
+def document_content(index, pages, articles_per_page, rng):
+    company = COMPANIES[index % len(COMPANIES)] + (f" {index // len(COMPANIES) + 1}" if index >= len(COMPANIES) else "")
+    content, facts, article = [], [], 1
+    for page_number in range(1, pages + 1):
+        paragraphs = [f"PERATURAN {company.upper()} BAGIAN {page_number}"] if page_number == 1 else []
+        for _ in range(articles_per_page):
+            topic, template, question = rng.choice(TOPICS)
+            value = str(rng.randint(2, 99))
+            paragraphs.append(f"Pasal {article} tentang {topic}. " + template.format(n=value))
+            paragraphs.append(FILLER)
+            facts.append({"question": question.format(company=company), "expected": value, "topic": topic,
+                          "article": article, "page": page_number})
+            article += 1
+        content.append(paragraphs)
+    return company, content, facts
+
+def render_page(paragraphs, font):
+    image = Image.new("L", PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(image)
+    y = MARGIN
+    for paragraph in paragraphs:
+        for line in textwrap.wrap(paragraph, WRAP_WIDTH):
+            draw.text((MARGIN, y), line, fill=0, font=font)
+            y += FONT_SIZE + LINE_SPACING
+        y += FONT_SIZE + LINE_SPACING  # Baris kosong antar paragraf
+    return image
+
+# Teks referensi dengan format yang sama seperti hasil OCR (paragraf dipisah baris kosong, halaman dengan form feed)
+def content_text(content):
+    return "\f".join("\n\n".join(paragraphs) for paragraphs in content)
+
+# Membuat documents PDF di output_dir. Mengembalikan (daftar dokumen, daftar pertanyaan).
+def generate(output_dir, documents=3, pages=3, articles_per_page=3, seed=0):
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    font = load_font()
+    docs, questions = [], []
+    for index in range(documents):
+        company, content, facts = document_content(index, pages, articles_per_page, rng)
+        name = f"peraturan_{index + 1:03d}"
+        pdf_path = os.path.join(output_dir, f"{name}.pdf")
+        images = [render_page(paragraphs, font) for paragraphs in content]
+        images[0].save(pdf_path, save_all=True, append_images=images[1:], resolution=PAGE_DPI)
+        docs.append({"name": name, "company": company, "pdf": pdf_path, "pages": pages, "text": content_text(content)})
+        questions.extend(dict(fact, source=name) for fact in facts)
+    with open(os.path.join(output_dir, "questions.json"), "w", encoding="utf-8") as file:
+        json.dump(questions, file, ensure_ascii=False, indent=2)
+    return docs, questions
@@ -0,0 +1,133 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from rag_common.models import get_embedding_model
+
+# Micro-batching untuk embedding query: query yang datang dalam beberapa milidetik digabung (sampai ukuran batch
+# maksimal) lalu di-encode dalam satu panggilan model, dan vektornya dikembalikan ke masing-masing request.
+# Waktu tunggu batch menukar sedikit latensi per request dengan throughput yang jauh lebih tinggi saat ramai.
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))  # Maksimal tunggu query lain
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "32"))
+EMBEDDING_BATCH_WORKERS = int(os.getenv("EMBEDDING_BATCH_WORKERS", "1"))  # Thread yang menjalankan encode
+
+class _Request:
+    __slots__ = ("text", "future", "enqueued")
+
+    def __init__(self, text):
+        self.text = text
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+class MicroBatcher:
+    def __init__(self, max_batch=EMBEDDING_MAX_BATCH, wait_ms=EMBEDDING_BATCH_WAIT_MS, workers=EMBEDDING_BATCH_WORKERS,
+                 encode=None):
+        self.max_batch = max_batch
+        self.wait = wait_ms / 1000
+        self.workers = workers
+        self._encode = encode or (lambda texts: get_embedding_model().encode(texts))
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {"requests": 0, "batches": 0, "wait_seconds": 0.0, "encode_seconds": 0.0,
+                         "max_batch_seen": 0, "errors": 0}
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(max(self.workers, 1)):
+                thread = threading.Thread(target=self._run, name=f"embedding-batcher-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    # Mengirim satu teks; mengembalikan concurrent.futures.Future berisi vektornya.
+    # Dari kode async: await asyncio.wrap_future(batcher.submit(text)).
+    def submit(self, text):
+        if not self._threads:
+            self._start()
+        request = _Request(text)
+        self._queue.put(request)
+        return request.future
+
+    # Versi blocking dari submit, untuk kode sinkron (mis. endpoint yang berjalan di threadpool)
+    def encode(self, text):
+        return self.submit(text).result()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = first.enqueued + self.wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)  # Teruskan sinyal berhenti ke worker lain
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._queue.put(None)
+                return
+            batch = self._collect(first)
+            started = time.perf_counter()
+            try:
+                vectors = self._encode([request.text for request in batch])
+            except Exception as e:
+                logger.error("Encode batch %d query gagal: %s", len(batch), e)
+                for request in batch:
+                    request.future.set_exception(e)
+                with self._metrics_lock:
+                    self._metrics["errors"] += 1
+                continue
+            finished = time.perf_counter()
+            for request, vector in zip(batch, vectors):
+                request.future.set_result(vector)
+            with self._metrics_lock:
+                self._metrics["requests"] += len(batch)
+                self._metrics["batches"] += 1
+                self._metrics["wait_seconds"] += sum(started - request.enqueued for request in batch)
+                self._metrics["encode_seconds"] += finished - started
+                self._metrics["max_batch_seen"] = max(self._metrics["max_batch_seen"], len(batch))
+
+    def stats(self):
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        requests, batches = metrics["requests"], metrics["batches"]
+        return {
+            "max_batch": self.max_batch,
+            "wait_ms": self.wait * 1000,
+            "requests": requests,
+            "batches": batches,
+            "errors": metrics["errors"],
+            "queued": self._queue.qsize(),
+            "avg_batch_size": round(requests / batches, 2) if batches else None,
+            "max_batch_seen": metrics["max_batch_seen"],
+            # Penalti latensi: rata-rata waktu query menunggu di antrean sebelum batch-nya di-encode
+            "avg_queue_wait_ms": round(metrics["wait_seconds"] / requests * 1000, 2) if requests else None,
+            "avg_encode_ms": round(metrics["encode_seconds"] / batches * 1000, 2) if batches else None,
+            "throughput_per_encode_second": round(requests / metrics["encode_seconds"], 1)
+            if metrics["encode_seconds"] else None,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._threads:
+                self._queue.put(None)
+                for thread in self._threads:
+                    thread.join(timeout=5)
+                self._threads = []
+                self._queue = queue.Queue()
+
+query_batcher = MicroBatcher()
@@ -0,0 +1,54 @@
+import argparse
+import os
+import time
+from rag_common.embedding import EmbeddingEngine, is_embeddable
+from rag_common.models import get_embedding_model
+
+# Mengukur throughput embedding (paragraf/detik) untuk encode per paragraf (cara lama) dan
+# encode per batch dengan beberapa ukuran batch, memakai paragraf dari folder hasil OCR.
+# Jalankan dari root repo: python -m rag_common.bench_embedding /OCR/result_ocr --batch-sizes 8 16 32 64
+
+def load_paragraphs(directory_path, limit):
+    paragraphs = []
+    for filename in sorted(os.listdir(directory_path)):
+        if filename.endswith('.txt'):
+            with open(os.path.join(directory_path, filename), 'r', encoding='utf-8') as file:
+                paragraphs.extend(p for p in file.read().split('\n\n') if is_embeddable(p))
+        if len(paragraphs) >= limit:
+            break
+    return paragraphs[:limit]
+
+def run(label, paragraphs, embed):
+    start = time.perf_counter()
+    count = embed(paragraphs)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {count:>9} {elapsed:>8.2f} {count / elapsed:>12.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark throughput embedding")
+    parser.add_argument("corpus_dir", help="Folder berisi file .txt hasil OCR")
+    parser.add_argument("--limit", type=int, default=2000, help="Jumlah paragraf maksimal")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 16, 32, 64, 128])
+    parser.add_argument("--workers", type=int, nargs="+", default=[0], help="Jumlah proses CPU yang diuji")
+    parser.add_argument("--skip-single", action="store_true", help="Lewati pengukuran encode per paragraf")
+    args = parser.parse_args()
+
+    paragraphs = load_paragraphs(args.corpus_dir, args.limit)
+    model = get_embedding_model()
+    model.encode(paragraphs[:8])  # Warm-up
+    print(f"{'mode':<24} {'paragraf':>9} {'detik':>8} {'paragraf/detik':>12}")
+
+    if not args.skip_single:
+        run("per paragraf", paragraphs, lambda texts: len([model.encode(text) for text in texts]))
+
+    for workers in args.workers:
+        for batch_size in args.batch_sizes:
+            engine = EmbeddingEngine(batch_size=batch_size, workers=workers)
+            try:
+                run(f"batch={batch_size} proses={workers}", paragraphs,
+                    lambda texts: sum(1 for _ in engine.iter_embeddings(enumerate(texts))))
+            finally:
+                engine.close()
+
+if __name__ == "__main__":
+    main()
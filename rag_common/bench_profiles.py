@@ -0,0 +1,81 @@
+import argparse
+import random
+import time
+import numpy as np
+from qdrant_client.http import models
+from rag_common.collection_profiles import PROFILES, copy_collection, get_profile, iter_points, physical_collection, search_params
+from rag_common.upsert import create_client
+
+# Benchmark recall vs latensi untuk profil collection: setiap profil dibuatkan salinan sementara dari collection
+# sumber, lalu query yang sama dijalankan pada semua salinan. Ground truth diambil dari pencarian exact (tanpa
+# HNSW/kuantisasi) pada collection sumber. Query berupa vektor point yang diambil acak dari collection sumber.
+# Jalankan dari root repo: python -m rag_common.bench_profiles http://localhost:6333 --profiles default scalar binary
+
+def sample_queries(client, collection_name, count, seed):
+    vectors = []
+    for point in iter_points(client, collection_name):
+        vector = point.vector.get("") if isinstance(point.vector, dict) else point.vector
+        vectors.append(vector)
+    random.Random(seed).shuffle(vectors)
+    return vectors[:count]
+
+def search_ids(client, collection_name, vector, k, params):
+    results = client.query_points(collection_name=collection_name, query=vector, limit=k, search_params=params,
+                                  with_payload=False, with_vectors=False).points
+    return [point.id for point in results]
+
+def wait_until_indexed(client, collection_name, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if client.get_collection(collection_name).status == models.CollectionStatus.GREEN:
+            return True
+        time.sleep(1)
+    return False
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recall dan latensi profil collection Qdrant")
+    parser.add_argument("url", help="URL Qdrant, mis. http://localhost:6333")
+    parser.add_argument("--collection", default="EBook", help="Collection atau alias sumber")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--index-timeout", type=int, default=600, help="Detik menunggu indexing selesai")
+    parser.add_argument("--keep", action="store_true", help="Jangan hapus collection benchmark")
+    args = parser.parse_args()
+
+    client = create_client(args.url)
+    source = physical_collection(client, args.collection)
+    queries = sample_queries(client, source, args.queries, args.seed)
+    exact = models.SearchParams(exact=True)
+    truth = [set(search_ids(client, source, vector, args.k, exact)) for vector in queries]
+    print(f"Sumber: {source}, {len(queries)} query, recall@{args.k} terhadap pencarian exact")
+    print(f"{'profil':<12} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'salin detik':>11}")
+
+    for name in args.profiles:
+        profile = get_profile(name)
+        target = f"bench_{source}_{name}"
+        if client.collection_exists(target):
+            client.delete_collection(target)
+        try:
+            start = time.perf_counter()
+            copy_collection(client, source, target, profile)
+            copy_seconds = time.perf_counter() - start
+            if not wait_until_indexed(client, target, args.index_timeout):
+                print(f"{name:<12} indexing belum selesai setelah {args.index_timeout} detik, hasil mungkin tidak stabil")
+
+            params = search_params(profile)
+            latencies, recalls = [], []
+            for vector, expected in zip(queries, truth):
+                query_start = time.perf_counter()
+                found = search_ids(client, target, vector, args.k, params)
+                latencies.append((time.perf_counter() - query_start) * 1000)
+                recalls.append(len(expected & set(found)) / len(expected) if expected else 1.0)
+            print(f"{name:<12} {np.mean(recalls):>7.4f} {np.percentile(latencies, 50):>8.2f} "
+                  f"{np.percentile(latencies, 95):>8.2f} {copy_seconds:>11.2f}")
+        finally:
+            if not args.keep:
+                client.delete_collection(target)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import os
+import re
+
+# Chunker streaming untuk file teks hasil OCR: file dibaca bertahap per halaman (halaman dipisahkan
+# form feed), teks dipecah per kalimat, lalu kalimat digabung menjadi chunk dengan jumlah token
+# terbatas dan overlap beberapa kalimat dengan chunk sebelumnya. Chunk tidak melewati batas halaman dan sebisa
+# mungkin dipotong di akhir paragraf, sehingga suntingan satu paragraf tidak menggeser isi chunk sesudahnya.
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "128"))  # Sesuaikan dengan max_seq_length model embedding
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+CHUNKER_VERSION = 2  # Dinaikkan jika aturan pemotongan berubah agar file yang sudah diindeks di-chunk ulang
+PARAGRAPH_CUT_MIN_FILL = 0.5  # Chunk ditutup di akhir paragraf begitu terisi minimal sebagian ini dari max_tokens
+READ_BLOCK_SIZE = 64 * 1024
+PAGE_SEPARATOR = "\f"
+
+# Akhir kalimat: tanda baca penutup yang diikuti spasi, atau baris kosong (akhir paragraf)
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*(?=\s)|\n\s*\n')
+PARAGRAPH_BREAK = re.compile(r'[ \t]*\n\s*\n')
+LAST_WORD = re.compile(r'(\w+)$')
+ROMAN_NUMERAL = re.compile(r'[IVXLC]+')
+# Singkatan yang diikuti titik tetapi tidak mengakhiri kalimat (dibandingkan dalam huruf kecil)
+ABBREVIATIONS = frozenset("""
+no nomor pasal ayat bab psl hlm hal dll dsb dst dkk tgl jl yth sdr bpk pt tbk cv dr drs ir prof kab kec kel
+""".split())
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+# Perkiraan jumlah token tanpa memuat tokenizer: kata dan tanda baca dihitung masing-masing satu token
+def estimate_tokens(text):
+    return len(TOKEN_PATTERN.findall(text))
+
+# Penghitung token memakai tokenizer model embedding
+def tokenizer_counter(tokenizer):
+    return lambda text: len(tokenizer.tokenize(text))
+
+# Membaca file per halaman tanpa memuat seluruh file. Menghasilkan (nomor_halaman, offset_awal, teks).
+def iter_pages(file_path):
+    page_number, page_offset, buffer = 1, 0, ""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        while True:
+            block = file.read(READ_BLOCK_SIZE)
+            buffer += block
+            *pages, buffer = buffer.split(PAGE_SEPARATOR)
+            for page in pages:
+                yield page_number, page_offset, page
+                page_number += 1
+                page_offset += len(page) + len(PAGE_SEPARATOR)
+            if not block:
+                break
+    yield page_number, page_offset, buffer
+
+# Titik setelah nomor ("Pasal 12."), huruf tunggal ("a."), angka Romawi, atau singkatan ("No.") bukan akhir kalimat
+def _is_non_terminal(text, match):
+    if match.group() != ".":
+        return False
+    word = LAST_WORD.search(text, max(0, match.start() - 32), match.start())
+    if word is None:
+        return False
+    word = word.group(1)
+    return (word.isdigit() or len(word) == 1 or ROMAN_NUMERAL.fullmatch(word) is not None
+            or word.lower() in ABBREVIATIONS)
+
+# Memecah teks menjadi kalimat. Menghasilkan (offset_awal, offset_akhir, kalimat, akhir_paragraf) relatif
+# terhadap teks; akhir_paragraf bernilai True untuk kalimat terakhir sebelum baris kosong atau akhir teks.
+def split_sentences(text):
+    position = 0
+    for match in SENTENCE_END.finditer(text):
+        if _is_non_terminal(text, match):
+            continue
+        paragraph_end = not match.group().strip() or PARAGRAPH_BREAK.match(text, match.end()) is not None
+        yield from _segment(text, position, match.end(), paragraph_end)
+        position = match.end()
+    yield from _segment(text, position, len(text), True)
+
+def _segment(text, start, end, paragraph_end):
+    segment = text[start:end]
+    stripped = segment.strip()
+    if stripped:
+        start += len(segment) - len(segment.lstrip())
+        yield start, start + len(stripped), re.sub(r'\s+', ' ', stripped), paragraph_end
+
+# Kalimat yang lebih panjang dari max_tokens dipotong per kata; hanya potongan terakhir yang bisa mengakhiri paragraf
+def _split_long_sentence(start, end, sentence, paragraph_end, max_tokens, count_tokens):
+    pieces, words, tokens = [], [], 0
+    for word in sentence.split(' '):
+        word_tokens = count_tokens(word)
+        if words and tokens + word_tokens > max_tokens:
+            pieces.append(' '.join(words))
+            words, tokens = [], 0
+        words.append(word)
+        tokens += word_tokens
+    pieces.append(' '.join(words))
+    # Offset potongan diperkirakan dari posisinya di kalimat yang sudah dinormalisasi
+    result, position = [], 0
+    for index, piece in enumerate(pieces):
+        piece_start = min(start + position, end)
+        result.append((piece_start, min(piece_start + len(piece), end), piece, count_tokens(piece),
+                       paragraph_end and index == len(pieces) - 1))
+        position += len(piece) + 1
+    return result
+
+def _emit(window):
+    return window[0][0], window[-1][1], ' '.join(p[2] for p in window)
+
+# Menggabungkan kalimat satu halaman menjadi chunk. Menghasilkan (offset_awal, offset_akhir, teks).
+def chunk_text(text, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS, count_tokens=estimate_tokens):
+    window, window_tokens = [], 0
+    for start, end, sentence, paragraph_end in split_sentences(text):
+        tokens = count_tokens(sentence)
+        parts = ([(start, end, sentence, tokens, paragraph_end)] if tokens <= max_tokens
+                 else _split_long_sentence(start, end, sentence, paragraph_end, max_tokens, count_tokens))
+        for part in parts:
+            if window and window_tokens + part[3] > max_tokens:
+                yield _emit(window)
+                # Sisakan kalimat terakhir sebagai overlap selama muat bersama kalimat berikutnya
+                overlap, overlap_tokens_used = [], 0
+                for previous in reversed(window):
+                    if overlap_tokens_used + previous[3] > overlap_tokens or \
+                            overlap_tokens_used + previous[3] + part[3] > max_tokens:
+                        break
+                    overlap.insert(0, previous)
+                    overlap_tokens_used += previous[3]
+                window, window_tokens = overlap, overlap_tokens_used
+            window.append(part)
+            window_tokens += part[3]
+            # Utamakan potongan di akhir paragraf: batas chunk hanya bergantung pada teks sejak potongan terakhir,
+            # sehingga setelah paragraf yang disunting batas chunk kembali sama; paragraf baru dimulai tanpa overlap
+            if part[4] and window_tokens >= max_tokens * PARAGRAPH_CUT_MIN_FILL:
+                yield _emit(window)
+                window, window_tokens = [], 0
+    if window:
+        yield _emit(window)
+
+# Menghasilkan chunk dari satu file beserta metadata: source, page, offset (karakter dari awal file),
+# end, dan chunk (nomor urut dalam file)
+def iter_file_chunks(file_path, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS,
+                     count_tokens=estimate_tokens):
+    source = os.path.basename(file_path)
+    index = 0
+    for page_number, page_offset, page in iter_pages(file_path):
+        for start, end, text in chunk_text(page, max_tokens, overlap_tokens, count_tokens):
+            yield {"text": text, "source": source, "page": page_number,
+                   "offset": page_offset + start, "end": page_offset + end, "chunk": index}
+            index += 1
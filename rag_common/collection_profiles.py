@@ -0,0 +1,190 @@
+import logging
+import os
+import time
+from qdrant_client.http import models
+from rag_common.sparse import SPARSE_VECTOR_NAME, document_vector, sparse_vectors_config
+from rag_common.upsert import upsert_points
+
+# Profil collection Qdrant: kuantisasi (scalar int8 / binary dengan rescoring), vektor di disk, dan parameter HNSW.
+# Service memakai nama alias (mis. "EBook") yang menunjuk ke collection fisik "<alias>_<profil>_<timestamp>",
+# sehingga migrasi ke profil lain dilakukan dengan menyalin point ke collection baru lalu memindahkan alias
+# secara atomik; pencarian tetap berjalan ke collection lama selama penyalinan.
+logger = logging.getLogger(__name__)
+
+QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "EBook")  # Alias yang dipakai semua service untuk ingest dan query
+QDRANT_COLLECTION_PROFILE = os.getenv("QDRANT_COLLECTION_PROFILE", "default")
+QDRANT_HNSW_M = os.getenv("QDRANT_HNSW_M")  # Override m untuk semua profil
+QDRANT_HNSW_EF_CONSTRUCT = os.getenv("QDRANT_HNSW_EF_CONSTRUCT")
+QDRANT_HNSW_EF = os.getenv("QDRANT_HNSW_EF")  # ef saat pencarian
+VECTOR_SIZE = 768
+MIGRATION_SCROLL_SIZE = 256
+
+PROFILES = {
+    # float32 di RAM, HNSW bawaan: paling akurat, paling boros RAM
+    "default": {"on_disk": False, "quantization": None, "m": 16, "ef_construct": 100, "hnsw_ef": 128,
+                "oversampling": None},
+    # int8 di RAM (4x lebih kecil), vektor asli di disk untuk rescoring
+    "scalar": {"on_disk": True, "quantization": "scalar", "m": 16, "ef_construct": 100, "hnsw_ef": 128,
+               "oversampling": 2.0},
+    # 1 bit per dimensi di RAM (32x lebih kecil), butuh oversampling lebih besar agar recall tetap baik
+    "binary": {"on_disk": True, "quantization": "binary", "m": 16, "ef_construct": 100, "hnsw_ef": 128,
+               "oversampling": 3.0},
+    # int8 dengan graf HNSW juga di disk dan m lebih kecil untuk node dengan RAM paling terbatas
+    "low_memory": {"on_disk": True, "quantization": "scalar", "m": 8, "ef_construct": 64, "hnsw_ef": 96,
+                   "oversampling": 2.0, "hnsw_on_disk": True},
+}
+
+def get_profile(name=None):
+    name = name or QDRANT_COLLECTION_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Profil collection tidak dikenal: {name} (pilihan: {', '.join(PROFILES)})")
+    profile = dict(PROFILES[name], name=name)
+    if QDRANT_HNSW_M:
+        profile["m"] = int(QDRANT_HNSW_M)
+    if QDRANT_HNSW_EF_CONSTRUCT:
+        profile["ef_construct"] = int(QDRANT_HNSW_EF_CONSTRUCT)
+    if QDRANT_HNSW_EF:
+        profile["hnsw_ef"] = int(QDRANT_HNSW_EF)
+    return profile
+
+def _quantization_config(profile):
+    if profile["quantization"] == "scalar":
+        return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8, quantile=0.99, always_ram=True))
+    if profile["quantization"] == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+# Argumen create_collection untuk satu profil
+def collection_config(profile):
+    return {
+        "vectors_config": models.VectorParams(size=VECTOR_SIZE, distance=models.Distance.COSINE,
+                                              on_disk=profile["on_disk"]),
+        "sparse_vectors_config": sparse_vectors_config(),
+        "hnsw_config": models.HnswConfigDiff(m=profile["m"], ef_construct=profile["ef_construct"],
+                                             on_disk=profile.get("hnsw_on_disk", False)),
+        "quantization_config": _quantization_config(profile),
+    }
+
+# Parameter pencarian sesuai profil: ef HNSW dan rescoring dengan vektor asli jika memakai kuantisasi
+def search_params(profile=None):
+    profile = profile or get_profile()
+    quantization = None
+    if profile["quantization"]:
+        quantization = models.QuantizationSearchParams(rescore=True, oversampling=profile["oversampling"])
+    return models.SearchParams(hnsw_ef=profile["hnsw_ef"], quantization=quantization)
+
+# Collection fisik yang ditunjuk alias, atau None jika alias belum ada
+def resolve_alias(client, alias):
+    for description in client.get_aliases().aliases:
+        if description.alias_name == alias:
+            return description.collection_name
+    return None
+
+# Nama collection fisik untuk alias; collection lama tanpa alias memakai namanya sendiri
+def physical_collection(client, alias):
+    return resolve_alias(client, alias) or alias
+
+# Profil collection fisik dibaca dari namanya ("<alias>_<profil>_<timestamp>") sehingga parameter pencarian
+# mengikuti collection yang sedang ditunjuk alias setelah migrasi. Collection lama tanpa alias memakai profil default.
+def collection_profile(alias, physical):
+    prefix = f"{alias}_"
+    if physical.startswith(prefix):
+        name = physical[len(prefix):].rsplit("_", 1)[0]
+        if name in PROFILES:
+            return get_profile(name)
+    return get_profile("default")
+
+def _collection_names(client):
+    return {c.name for c in client.get_collections().collections}
+
+def physical_name(alias, profile):
+    return f"{alias}_{profile['name']}_{int(time.time() * 1000)}"
+
+# Membuat collection dengan profil yang dipilih beserta aliasnya jika belum ada. Collection lama tanpa alias
+# (bernama sama dengan alias) dibiarkan dan tetap dipakai sampai dimigrasikan.
+def ensure_collection(client, alias, profile=None):
+    if resolve_alias(client, alias) or alias in _collection_names(client):
+        return
+    profile = profile or get_profile()
+    target = physical_name(alias, profile)
+    client.create_collection(collection_name=target, **collection_config(profile))
+    client.update_collection_aliases(change_aliases_operations=[
+        models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=target, alias_name=alias))])
+    logger.info("Collection %s dibuat dengan profil %s (alias %s)", target, profile["name"], alias)
+
+# Mengubah point hasil scroll menjadi PointStruct untuk collection tujuan; sparse vector dihitung dari teks
+# jika collection sumber belum memilikinya
+def _copy_point(point):
+    vector = point.vector
+    dense, sparse = (vector.get(""), vector.get(SPARSE_VECTOR_NAME)) if isinstance(vector, dict) else (vector, None)
+    if sparse is None:
+        sparse = document_vector((point.payload or {}).get("text", ""))
+    return models.PointStruct(id=point.id, vector={"": dense, SPARSE_VECTOR_NAME: sparse}, payload=point.payload)
+
+def iter_points(client, collection_name, scroll_size=MIGRATION_SCROLL_SIZE):
+    offset = None
+    while True:
+        points, offset = client.scroll(collection_name=collection_name, limit=scroll_size, offset=offset,
+                                       with_payload=True, with_vectors=True)
+        yield from points
+        if offset is None:
+            return
+
+# Menyalin semua point dari source ke collection baru dengan profil tertentu. Mengembalikan jumlah point.
+def copy_collection(client, source, target, profile, progress=None):
+    client.create_collection(collection_name=target, **collection_config(profile))
+    copied = upsert_points(client, target, (_copy_point(point) for point in iter_points(client, source)),
+                           progress=progress)
+    expected = client.count(collection_name=source, exact=True).count
+    actual = client.count(collection_name=target, exact=True).count
+    if actual != expected:
+        raise RuntimeError(f"Jumlah point tidak sama setelah penyalinan: {source}={expected}, {target}={actual}")
+    return copied
+
+# Migrasi non-destruktif: salin ke collection baru, pindahkan alias secara atomik, lalu hapus collection lama
+# (kecuali keep_old). Collection lama tanpa alias harus dihapus dulu sebelum aliasnya dibuat, sehingga ada jeda
+# sangat singkat tanpa collection hanya pada migrasi pertama.
+def migrate_collection(client, alias, profile=None, keep_old=False, progress=None):
+    profile = profile or get_profile()
+    source = resolve_alias(client, alias)
+    legacy = source is None
+    if legacy:
+        if alias not in _collection_names(client):
+            raise RuntimeError(f"Collection {alias} tidak ditemukan")
+        if keep_old:
+            raise RuntimeError(f"Collection lama {alias} harus dihapus agar nama tersebut bisa dipakai sebagai alias")
+        source = alias
+    target = physical_name(alias, profile)
+    start = time.time()
+    logger.info("Migrasi %s: %s -> %s (profil %s)", alias, source, target, profile["name"])
+    try:
+        copied = copy_collection(client, source, target, profile, progress)
+    except Exception:
+        client.delete_collection(collection_name=target)
+        raise
+
+    create_alias = models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=target, alias_name=alias))
+    if legacy:
+        client.delete_collection(collection_name=source)
+        client.update_collection_aliases(change_aliases_operations=[create_alias])
+    else:
+        client.update_collection_aliases(change_aliases_operations=[
+            models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)), create_alias])
+        if not keep_old:
+            client.delete_collection(collection_name=source)
+    elapsed = round(time.time() - start, 2)
+    logger.info("Migrasi %s selesai: %d point dalam %.2f detik", alias, copied, elapsed)
+    return {"alias": alias, "source": source, "target": target, "profile": profile["name"], "points": copied,
+            "source_deleted": not keep_old, "seconds": elapsed}
+
+# Informasi collection aktif: collection fisik, profil, jumlah point, status, dan konfigurasi vektor
+def collection_info(client, alias):
+    physical = physical_collection(client, alias)
+    info = client.get_collection(collection_name=physical)
+    params = info.config.params
+    return {"alias": alias, "collection": physical, "status": str(info.status), "points": info.points_count,
+            "on_disk": params.vectors.on_disk, "sparse": SPARSE_VECTOR_NAME in (params.sparse_vectors or {}),
+            "quantization": str(info.config.quantization_config) if info.config.quantization_config else None,
+            "hnsw": {"m": info.config.hnsw_config.m, "ef_construct": info.config.hnsw_config.ef_construct,
+                     "on_disk": info.config.hnsw_config.on_disk}}
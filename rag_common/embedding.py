@@ -0,0 +1,84 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from rag_common.metrics import span
+from rag_common.models import get_embedding_model, registry
+
+# Mesin embedding untuk ingest korpus: paragraf kosong dibuang, paragraf diurutkan menurut panjang
+# dalam satu jendela lalu di-encode per batch, dan hasilnya dialirkan per jendela sehingga upsert
+# ke Qdrant bisa berjalan sementara jendela berikutnya di-encode.
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_WINDOW = int(os.getenv("EMBEDDING_WINDOW", "1024"))  # Jumlah paragraf yang diurutkan dan di-encode sekaligus
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "0"))  # >1: pool multi-proses (hanya dipakai di CPU)
+
+# Membuang teks kosong atau hanya berisi spasi
+def is_embeddable(text):
+    return bool(text and text.strip())
+
+class EmbeddingEngine:
+    def __init__(self, batch_size=EMBEDDING_BATCH_SIZE, window=EMBEDDING_WINDOW, workers=EMBEDDING_WORKERS):
+        self.batch_size = batch_size
+        self.window = max(window, batch_size)
+        self.workers = workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    # Pool multi-proses SentenceTransformer, hanya untuk node tanpa GPU
+    def _get_pool(self, model):
+        if self.workers <= 1 or registry.status(["embedding"])["models"]["embedding"]["device"] != "cpu":
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                logger.info("Memulai pool embedding dengan %d proses", self.workers)
+                self._pool = model.start_multi_process_pool(["cpu"] * self.workers)
+        return self._pool
+
+    # Meng-encode satu daftar teks; urutan hasil sama dengan urutan masukan
+    def encode(self, texts):
+        if not texts:
+            return []
+        model = get_embedding_model()
+        # Urutkan menurut panjang agar padding di setiap batch minimal
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        sorted_texts = [texts[i] for i in order]
+        pool = self._get_pool(model)
+        with span("embed_batch"):
+            if pool is not None:
+                vectors = model.encode_multi_process(sorted_texts, pool, batch_size=self.batch_size)
+            else:
+                vectors = model.encode(sorted_texts, batch_size=self.batch_size)
+        result = [None] * len(texts)
+        for position, index in enumerate(order):
+            result[index] = vectors[position]
+        return result
+
+    # items: iterable (key, teks). Menghasilkan (key, teks, vektor) per jendela; teks kosong dilewati.
+    # Jendela berikutnya di-encode di thread latar sementara pemanggil memproses jendela sebelumnya.
+    def iter_embeddings(self, items):
+        items = iter((key, text) for key, text in items if is_embeddable(text))
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding") as executor:
+            def submit():
+                window = list(islice(items, self.window))
+                if not window:
+                    return None
+                return window, executor.submit(self.encode, [text for _, text in window])
+
+            pending = submit()
+            while pending is not None:
+                window, future = pending
+                vectors = future.result()
+                pending = submit()
+                for (key, text), vector in zip(window, vectors):
+                    yield key, text, vector
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                get_embedding_model().stop_multi_process_pool(self._pool)
+                self._pool = None
+
+embedding_engine = EmbeddingEngine()
@@ -0,0 +1,275 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from qdrant_client.http.models import (PointStruct, Filter, FieldCondition, MatchValue, IsEmptyCondition, PayloadField,
+                                       PointIdsList, SetPayload, SetPayloadOperation)
+from rag_common.chunking import (CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNKER_VERSION, iter_file_chunks,
+                                 tokenizer_counter)
+from rag_common.collection_profiles import QDRANT_COLLECTION, ensure_collection, migrate_collection
+from rag_common.embedding import embedding_engine
+from rag_common.metrics import REQUEST_ID_HEADER, request_id_var
+from rag_common.models import get_embedding_model
+from rag_common.query import collection_has_sparse
+from rag_common.sparse import SparseSupportCache, point_vector
+from rag_common.upsert import iter_batches, upsert_points
+
+# Tahap ingest bersama: file .txt -> chunk -> embed -> upsert ke alias collection, dipakai service Qdrant
+# (/status_qdrant/) dan CLI ingest offline (python -m rag_common.ingest). Manifest mencatat hash dan id point
+# setiap file sehingga hanya chunk yang berubah yang di-embed ulang. Manifest disimpan setelah setiap file dan
+# sebelum upsert sebuah file dimulai (checkpoint), sehingga proses yang terhenti di tengah file besar
+# dilanjutkan tanpa meng-embed ulang point yang sudah ada di Qdrant.
+logger = logging.getLogger(__name__)
+
+QDRANT_MANIFEST_PATH = os.getenv("QDRANT_MANIFEST_PATH", "/OCR/qdrant_manifest.json")
+OCR_RESULT_DIR = os.getenv("OCR_RESULT_DIR", "/OCR/result_ocr")
+# Endpoint service LLM untuk mengosongkan cache jawaban setelah collection berubah (kosong: nonaktif)
+LLM_CACHE_INVALIDATE_URL = os.getenv("LLM_CACHE_INVALIDATE_URL", "http://llm_api:8003/cache/invalidate")
+RESUME_LOOKUP_BATCH_SIZE = 256  # Id point per request saat memeriksa point yang sudah ada
+POSITION_UPDATE_BATCH_SIZE = 256  # Point per request saat memperbarui posisi chunk yang tidak di-embed ulang
+POSITION_FIELDS = ("page", "offset", "end", "chunk")
+
+# Parameter chunking disimpan di manifest; jika berubah semua file diindeks ulang
+CHUNK_SETTINGS = {"max_tokens": CHUNK_MAX_TOKENS, "overlap_tokens": CHUNK_OVERLAP_TOKENS, "version": CHUNKER_VERSION}
+
+# Namespace untuk membuat id point yang deterministik dari nama file dan isi chunk
+POINT_NAMESPACE = uuid.UUID("6f1c2a52-8a3e-4d7b-9c61-3b0f6f2d9e41")
+
+class IndexerBusy(Exception):
+    pass
+
+# Fungsi untuk membuat id point dari nama file dan isi chunk. Posisi (page, offset) tidak ikut agar suntingan di
+# awal file tidak mengubah id semua chunk sesudahnya; occurrence membedakan teks yang sama persis dalam satu file.
+def chunk_id(chunk, occurrence=0):
+    return str(uuid.uuid5(POINT_NAMESPACE, f"{chunk['source']}\x00{occurrence}\x00{chunk['text']}"))
+
+# Fungsi untuk menghitung hash file .txt per blok
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Fungsi untuk membaca chunk satu file .txt; jumlah token dihitung dengan tokenizer model embedding
+def read_file_chunks(file_path):
+    count_tokens = tokenizer_counter(get_embedding_model().tokenizer)
+    return iter_file_chunks(file_path, count_tokens=count_tokens)
+
+# Memberi tahu service LLM agar cache jawaban dan konteks sesi yang lama tidak dipakai lagi
+def invalidate_answer_cache(url=LLM_CACHE_INVALIDATE_URL):
+    if not url:
+        return
+    try:
+        # Request id pembaruan diteruskan agar log kedua service bisa dikorelasikan
+        request_id = request_id_var.get()
+        headers = {REQUEST_ID_HEADER: request_id} if request_id != "-" else {}
+        request = urllib.request.Request(url, method="POST", headers=headers)
+        with urllib.request.urlopen(request, timeout=5) as response:
+            logger.info(f"Cache jawaban LLM dikosongkan: {response.read().decode()}")
+    except Exception as e:
+        logger.warning(f"Gagal mengosongkan cache jawaban LLM: {str(e)}")
+
+class Indexer:
+    # progress: dict yang diperbarui selama update (mis. untuk /status_qdrant/progress).
+    # sparse_support dibagi dengan tahap query agar hasil pengecekan sparse vector setelah update/migrasi langsung
+    # terlihat oleh pencarian.
+    def __init__(self, client, collection_name=QDRANT_COLLECTION, manifest_path=QDRANT_MANIFEST_PATH,
+                 engine=embedding_engine, profile=None, progress=None, sparse_support=None):
+        self.client = client
+        self.collection_name = collection_name
+        self.manifest_path = manifest_path
+        self.engine = engine
+        self.profile = profile
+        self.progress = progress if progress is not None else {}
+        self.progress.update(running=False, file=None, files_done=0, files_total=0, points_upserted=0)
+        self.sparse_support = sparse_support if sparse_support is not None else SparseSupportCache()
+
+    # Satu proses (service atau CLI) yang memperbarui manifest yang sama pada satu waktu
+    @contextmanager
+    def lock(self):
+        with open(f"{self.manifest_path}.lock", 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise IndexerBusy(f"Manifest {self.manifest_path} sedang dipakai proses lain")
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # Fungsi untuk membaca manifest hash file yang sudah diindeks
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            return None
+        if manifest.get("collection") != self.collection_name:
+            return None
+        return manifest
+
+    # Fungsi untuk menyimpan manifest secara atomik agar tidak rusak jika proses terhenti
+    def save_manifest(self, manifest):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file)
+        os.replace(tmp_path, self.manifest_path)
+
+    def has_sparse(self, refresh=False):
+        return collection_has_sparse(self.client, self.collection_name, self.sparse_support, refresh)
+
+    # Fungsi untuk menghapus semua poin milik satu file
+    def delete_file_points(self, filename):
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=Filter(must=[FieldCondition(key="source", match=MatchValue(value=filename))]),
+        )
+
+    # Memperbarui posisi (payload) chunk yang isinya tidak berubah tetapi letaknya bergeser, tanpa embedding ulang
+    def update_positions(self, chunks_by_id, point_ids):
+        for batch in iter_batches(point_ids, POSITION_UPDATE_BATCH_SIZE):
+            operations = [SetPayloadOperation(set_payload=SetPayload(
+                payload={field: chunks_by_id[point_id][field] for field in POSITION_FIELDS}, points=[point_id]))
+                for point_id in batch]
+            self.client.batch_update_points(collection_name=self.collection_name, update_operations=operations)
+
+    # Id point yang sudah tersimpan di collection, untuk melanjutkan file yang upsert-nya terhenti
+    def existing_ids(self, point_ids):
+        existing = set()
+        for batch in iter_batches(point_ids, RESUME_LOOKUP_BATCH_SIZE):
+            points = self.client.retrieve(collection_name=self.collection_name, ids=batch,
+                                          with_payload=False, with_vectors=False)
+            existing.update(str(point.id) for point in points)
+        return existing
+
+    # Fungsi untuk menyinkronkan satu file: embedding dan upsert dialirkan per batch,
+    # lalu chunk yang sudah tidak ada dihapus
+    # sparse: apakah point juga diberi sparse vector BM25
+    def update_file(self, directory_path, filename, manifest, stats, sparse):
+        indexed_files = manifest["files"]
+        file_path = os.path.join(directory_path, filename)
+        file_hash = file_sha256(file_path)
+        previous = indexed_files.get(filename)
+        same_vectors = previous is not None and previous.get("sparse", False) == sparse
+        if same_vectors and previous["sha256"] == file_hash and previous.get("chunking") == CHUNK_SETTINGS:
+            stats["files_unchanged"] += 1
+            return
+
+        # Teks yang muncul lebih dari sekali diberi nomor kemunculan agar setiap chunk tetap punya point sendiri
+        chunks_by_id, occurrences = {}, {}
+        for chunk in read_file_chunks(file_path):
+            occurrence = occurrences.get(chunk["text"], 0)
+            occurrences[chunk["text"]] = occurrence + 1
+            chunks_by_id[chunk_id(chunk, occurrence)] = chunk
+        old_ids = set(previous["points"]) if previous else set()
+        # Jika jenis vektor berubah (mis. sparse vector baru tersedia), semua chunk di-upsert ulang
+        reusable_ids = old_ids if same_vectors else set()
+        new_ids = [point_id for point_id in chunks_by_id if point_id not in reusable_ids]
+        stale_ids = sorted(old_ids - chunks_by_id.keys())
+
+        # Checkpoint yang sama dengan file ini berarti upsert sebelumnya terhenti: point yang sudah ada dilewati
+        checkpoint = {"file": filename, "sha256": file_hash, "chunking": CHUNK_SETTINGS, "sparse": sparse}
+        if new_ids and manifest.get("checkpoint") == checkpoint:
+            resumed = self.existing_ids(new_ids)
+            new_ids = [point_id for point_id in new_ids if point_id not in resumed]
+            stats["points_resumed"] += len(resumed)
+            logger.info(f"{filename}: melanjutkan upsert, {len(resumed)} chunk sudah ada")
+        elif new_ids:
+            manifest["checkpoint"] = checkpoint
+            self.save_manifest(manifest)
+
+        upserted = 0
+        if new_ids:
+            embeddings = self.engine.iter_embeddings((point_id, chunks_by_id[point_id]["text"]) for point_id in new_ids)
+            points = (PointStruct(id=point_id, vector=point_vector(embedding, text, sparse), payload=chunks_by_id[point_id])
+                      for point_id, text, embedding in embeddings)
+            base = self.progress["points_upserted"]
+            upserted = upsert_points(self.client, self.collection_name, points,
+                                     progress=lambda done: self.progress.update(points_upserted=base + done))
+        kept_ids = [point_id for point_id in chunks_by_id if point_id in reusable_ids]
+        if kept_ids:
+            self.update_positions(chunks_by_id, kept_ids)
+        if stale_ids:
+            self.client.delete(collection_name=self.collection_name, points_selector=PointIdsList(points=stale_ids))
+
+        stats["files_changed" if previous else "files_added"] += 1
+        stats["points_upserted"] += upserted
+        stats["points_deleted"] += len(stale_ids)
+        indexed_files[filename] = {"sha256": file_hash, "chunking": CHUNK_SETTINGS, "sparse": sparse,
+                                   "points": list(chunks_by_id)}
+        manifest.pop("checkpoint", None)
+        self.save_manifest(manifest)
+        logger.info(f"{filename}: {upserted} chunk baru, {len(stale_ids)} chunk dihapus")
+
+    # Fungsi untuk memperbarui collection Qdrant sesuai file .txt secara inkremental:
+    # hanya chunk baru yang di-embed dan di-upsert, chunk/file yang hilang dihapus.
+    # Point baru di-upsert lebih dulu sebelum point lama dihapus sehingga collection tetap bisa dicari selama update.
+    # files: daftar nama file yang diproses (default semua .txt); file di luar daftar tidak dihapus dari collection.
+    def update_collection(self, directory_path, files=None):
+        with self.lock():
+            return self._update_collection(directory_path, files)
+
+    def _update_collection(self, directory_path, files):
+        ensure_collection(self.client, self.collection_name, self.profile)
+        sparse = self.has_sparse(refresh=True)
+        if not sparse:
+            logger.warning("Collection tidak punya sparse vector BM25, hanya vektor dense yang diindeks")
+
+        manifest = self.load_manifest()
+        legacy_collection = manifest is None
+        if legacy_collection:
+            manifest = {"collection": self.collection_name, "files": {}}
+        indexed_files = manifest["files"]
+        stats = {"files_added": 0, "files_changed": 0, "files_unchanged": 0, "files_removed": 0,
+                 "points_upserted": 0, "points_deleted": 0, "points_resumed": 0}
+
+        filenames = sorted(f for f in os.listdir(directory_path) if f.endswith('.txt'))
+        if files is not None:
+            wanted = set(files)
+            filenames = [f for f in filenames if f in wanted]
+        self.progress.update(running=True, file=None, files_done=0, files_total=len(filenames), points_upserted=0)
+        try:
+            for filename in filenames:
+                self.progress["file"] = filename
+                self.update_file(directory_path, filename, manifest, stats, sparse)
+                self.progress["files_done"] += 1
+        finally:
+            self.progress.update(running=False, file=None)
+
+        # Hapus point dari file yang sudah tidak ada
+        removed = set(indexed_files) - set(filenames) if files is None else set()
+        for filename in sorted(removed):
+            self.delete_file_points(filename)
+            stats["files_removed"] += 1
+            stats["points_deleted"] += len(indexed_files.pop(filename)["points"])
+            self.save_manifest(manifest)
+            logger.info(f"{filename}: file dihapus dari collection")
+
+        # Point dari versi lama (id berurutan tanpa payload "source") dihapus setelah point baru tersedia
+        if legacy_collection:
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=Filter(must=[IsEmptyCondition(is_empty=PayloadField(key="source"))]),
+            )
+            self.save_manifest(manifest)
+
+        return stats
+
+    # Fungsi untuk memigrasikan collection ke profil lain tanpa menghapus data; sparse vector ikut dibuat saat
+    # penyalinan sehingga manifest ditandai agar file tidak di-upsert ulang
+    def migrate(self, profile, keep_old=False):
+        with self.lock():
+            result = migrate_collection(self.client, self.collection_name, profile, keep_old=keep_old,
+                                        progress=lambda done: self.progress.update(points_upserted=done))
+            self.has_sparse(refresh=True)
+            manifest = self.load_manifest()
+            if manifest is not None:
+                for entry in manifest["files"].values():
+                    entry["sparse"] = True
+                self.save_manifest(manifest)
+            return result
@@ -0,0 +1,52 @@
+import argparse
+import json
+import sys
+import time
+from rag_common.collection_profiles import PROFILES, QDRANT_COLLECTION, get_profile
+from rag_common.embedding import embedding_engine
+from rag_common.indexing import (LLM_CACHE_INVALIDATE_URL, OCR_RESULT_DIR, QDRANT_MANIFEST_PATH, Indexer, IndexerBusy,
+                                 invalidate_answer_cache)
+from rag_common.metrics import configure_logging
+from rag_common.upsert import QDRANT_URL, create_client
+
+# CLI ingest offline: mengindeks semua file .txt di satu direktori ke collection Qdrant dengan pipeline yang sama
+# seperti service Qdrant (chunk -> embed -> upsert). Proses boleh dihentikan kapan saja; menjalankan ulang perintah
+# yang sama melanjutkan dari checkpoint di manifest (file yang sudah selesai dilewati, file yang terhenti di tengah
+# hanya meng-upsert chunk yang belum ada). Memakai manifest yang sama dengan service sehingga /status_qdrant/
+# berikutnya tidak mengindeks ulang.
+# Jalankan dari root repo: python -m rag_common.ingest /OCR/result_ocr --url http://localhost:6333
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest offline file .txt ke collection Qdrant")
+    parser.add_argument("directory", nargs="?", default=OCR_RESULT_DIR, help="Direktori berisi file .txt")
+    parser.add_argument("--url", default=QDRANT_URL, help="URL Qdrant")
+    parser.add_argument("--collection", default=QDRANT_COLLECTION, help="Alias collection")
+    parser.add_argument("--manifest", default=QDRANT_MANIFEST_PATH, help="File manifest/checkpoint")
+    parser.add_argument("--profile", choices=list(PROFILES), help="Profil jika collection belum ada")
+    parser.add_argument("--files", nargs="+", help="Hanya file ini (nama file di dalam direktori)")
+    parser.add_argument("--invalidate-url", default=LLM_CACHE_INVALIDATE_URL,
+                        help="Endpoint cache service LLM yang dikosongkan setelah collection berubah (kosong: tidak)")
+    args = parser.parse_args()
+
+    configure_logging()
+    indexer = Indexer(create_client(args.url), args.collection, args.manifest,
+                      profile=get_profile(args.profile) if args.profile else None)
+    start = time.perf_counter()
+    try:
+        stats = indexer.update_collection(args.directory, files=args.files)
+    except IndexerBusy as e:
+        print(f"Ingest dibatalkan: {e}", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print(f"Ingest dihentikan setelah {indexer.progress['files_done']} file; jalankan ulang untuk melanjutkan",
+              file=sys.stderr)
+        sys.exit(130)
+    finally:
+        embedding_engine.close()
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    if stats["points_upserted"] or stats["points_deleted"]:
+        invalidate_answer_cache(args.invalidate_url)
+    print(json.dumps(stats, indent=2))
+
+if __name__ == "__main__":
+    main()
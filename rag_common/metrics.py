@@ -0,0 +1,273 @@
+import bisect
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Instrumentasi ringan untuk semua service: histogram/counter/gauge format teks Prometheus di /metrics,
+# span waktu per tahap pipeline (rasterize, layout, recognize, embed, upsert, search, generate), dan request id
+# yang diteruskan lewat header X-Request-ID serta ikut tercetak di setiap baris log. Tanpa dependensi tambahan;
+# biaya per observasi hanya satu bisect dan satu lock.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+REQUEST_ID_HEADER = "X-Request-ID"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+REQUEST_ID_PATTERN = re.compile(r'^[\w.\-]{1,64}$')
+
+request_id_var = ContextVar("request_id", default="-")
+# Daftar (tahap, detik) milik request yang sedang berjalan, untuk ringkasan log per request
+_spans_var = ContextVar("spans", default=None)
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+# Request id dari klien dipakai jika formatnya aman untuk log, selain itu dibuat baru
+def valid_request_id(value):
+    return value if value and REQUEST_ID_PATTERN.match(value) else new_request_id()
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+# Pengganti logging.basicConfig untuk service: level dari LOG_LEVEL dan request id di setiap baris
+def configure_logging(level=LOG_LEVEL):
+    logging.basicConfig(level=level, format='%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s')
+    for handler in logging.getLogger().handlers:
+        if not any(isinstance(f, RequestIdFilter) for f in handler.filters):
+            handler.addFilter(RequestIdFilter())
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [jumlah per bucket (+Inf terakhir), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in sorted(series):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in values)
+        return lines
+
+# Nilai dibaca dari callback saat /metrics diminta; callback yang mengembalikan None dilewati.
+# kind="counter" untuk nilai kumulatif yang dikelola di tempat lain (mis. waktu CPU proses).
+class Gauge:
+    def __init__(self, name, help_text, callback, kind="gauge"):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+        self.kind = kind
+
+    def render(self):
+        try:
+            value = self.callback()
+        except Exception:
+            value = None
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", f"{self.name} {value}"]
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(name, lambda: Histogram(name, help_text, labelnames, buckets))
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._get_or_create(name, lambda: Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, callback, kind="gauge"):
+        return self._get_or_create(name, lambda: Gauge(name, help_text, callback, kind))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+STAGE_DURATION = metrics.histogram("rag_stage_duration_seconds", "Durasi per tahap pipeline", ("stage",))
+HTTP_DURATION = metrics.histogram("rag_http_request_duration_seconds", "Durasi request HTTP",
+                                  ("method", "route", "status"))
+
+def _resident_memory_bytes():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+
+# Hanya dibaca jika torch sudah dimuat oleh service agar scrape tidak memicu import torch
+def _cuda_memory_reserved_bytes():
+    if "torch" not in sys.modules:
+        return None
+    from rag_common.models import cuda_memory_reserved_mb
+    reserved = cuda_memory_reserved_mb()
+    return None if reserved is None else int(reserved * 1024 ** 2)
+
+metrics.gauge("process_resident_memory_bytes", "Resident memory proses", _resident_memory_bytes)
+metrics.gauge("process_cpu_seconds_total", "Waktu CPU proses (semua thread)", time.process_time, "counter")
+metrics.gauge("rag_cuda_memory_reserved_bytes", "Memori GPU yang dicadangkan torch", _cuda_memory_reserved_bytes)
+
+# Mencatat durasi satu tahap ke histogram dan ke ringkasan request/capture yang sedang aktif
+def record(stage, seconds):
+    spans = _spans_var.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+    if METRICS_ENABLED:
+        STAGE_DURATION.observe(seconds, stage=stage)
+
+@contextmanager
+def span(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+# Menampung span di proses worker (mis. process pool OCR) agar bisa dikirim balik dan dicatat di proses utama
+@contextmanager
+def capture_spans():
+    spans = []
+    token = _spans_var.set(spans)
+    try:
+        yield spans
+    finally:
+        _spans_var.reset(token)
+
+def record_spans(spans):
+    for stage, seconds in spans:
+        record(stage, seconds)
+
+def _summarize(spans):
+    totals = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return " ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in totals.items())
+
+# Middleware ASGI murni (bukan BaseHTTPMiddleware) agar durasi respons streaming terukur sampai selesai dan
+# request id tetap terbawa ke endpoint sinkron di threadpool
+class MetricsMiddleware:
+    def __init__(self, app, metrics_path="/metrics"):
+        self.app = app
+        self.metrics_path = metrics_path
+        self.logger = logging.getLogger("rag_common.metrics")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = dict(scope.get("headers") or []).get(REQUEST_ID_HEADER.lower().encode(), b"")
+        request_id = valid_request_id(header.decode("latin-1"))
+        request_token = request_id_var.set(request_id)
+        spans_token = _spans_var.set([])
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+                message = dict(message, headers=headers)
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = getattr(scope.get("route"), "path", None)
+            if scope["path"] != self.metrics_path:
+                if METRICS_ENABLED:
+                    # Label route memakai pola path (mis. /jobs/{job_id}) agar jumlah series tetap kecil
+                    HTTP_DURATION.observe(elapsed, method=scope["method"], route=route or "unmatched",
+                                          status=status)
+                spans = _spans_var.get()
+                level = logging.INFO if spans else logging.DEBUG
+                if self.logger.isEnabledFor(level):
+                    self.logger.log(level, "%s %s %d %.1fms %s", scope["method"], route or scope["path"], status,
+                                    elapsed * 1000, _summarize(spans))
+            _spans_var.reset(spans_token)
+            request_id_var.reset(request_token)
+
+# Memasang middleware dan endpoint /metrics pada aplikasi FastAPI/Starlette
+def instrument_app(app, path="/metrics"):
+    from starlette.responses import Response
+
+    async def metrics_endpoint(request):
+        return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+    app.add_middleware(MetricsMiddleware, metrics_path=path)
+    app.add_route(path, metrics_endpoint, methods=["GET"], include_in_schema=False)
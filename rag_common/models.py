@@ -0,0 +1,136 @@
+import logging
+import os
+import threading
+import time
+
+# Registry model bersama untuk semua service: model dimuat saat pertama kali dipakai (lazy)
+# atau lewat warm-up saat startup, dengan pemilihan device yang otomatis jatuh ke CPU.
+logger = logging.getLogger(__name__)
+
+PROCESS_START = time.time()
+
+MODEL_DEVICE = os.getenv("MODEL_DEVICE", "auto")  # auto | cpu | cuda | cuda:N
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"  # Muat model di background saat startup
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "paraphrase-multilingual-mpnet-base-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | onnx | openvino
+EMBEDDING_MODEL_FILE = os.getenv("EMBEDDING_MODEL_FILE")  # mis. onnx/model_qint8_avx512_vnni.onnx
+EMBEDDING_QUANTIZE = os.getenv("EMBEDDING_QUANTIZE", "0") == "1"  # Kuantisasi dinamis int8 untuk backend torch di CPU
+
+# Memilih device untuk model, jatuh ke CPU jika CUDA tidak tersedia
+def select_device(preferred=None):
+    preferred = preferred or MODEL_DEVICE
+    if preferred == "cpu":
+        return "cpu"
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+    if torch.cuda.is_available():
+        return "cuda" if preferred == "auto" else preferred
+    if preferred != "auto":
+        logger.warning("Device %s tidak tersedia, memakai CPU", preferred)
+    return "cpu"
+
+# Memori GPU yang sudah dicadangkan (MB), None jika tidak ada CUDA
+def cuda_memory_reserved_mb():
+    try:
+        import torch
+    except ImportError:
+        return None
+    if not torch.cuda.is_available():
+        return None
+    return torch.cuda.memory_reserved(0) / (1024 ** 2)
+
+class ModelRegistry:
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._status = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+
+    # loader dipanggil sebagai loader(device) dan mengembalikan objek model
+    def register(self, name, loader, device=None):
+        with self._lock:
+            self._loaders[name] = (loader, device)
+            self._locks.setdefault(name, threading.Lock())
+            self._status.setdefault(name, {"loaded": False, "device": None, "load_seconds": None, "error": None})
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is None:
+                model = self._load(name)
+        return model
+
+    def _load(self, name):
+        loader, preferred = self._loaders[name]
+        device = select_device(preferred)
+        start = time.time()
+        logger.info("Memuat model %s di %s", name, device)
+        try:
+            model = loader(device)
+        except Exception as e:
+            self._status[name]["error"] = str(e)
+            raise
+        self._models[name] = model
+        self._status[name] = {"loaded": True, "device": device, "load_seconds": round(time.time() - start, 2),
+                              "loaded_at": time.time(), "error": None}
+        logger.info("Model %s siap dalam %.2f detik", name, self._status[name]["load_seconds"])
+        return model
+
+    def warmup(self, names=None):
+        for name in list(self._loaders) if names is None else names:
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.error("Warm-up model %s gagal: %s", name, e)
+
+    # Warm-up di thread terpisah agar server sudah bisa menerima request (mis. /health) selama model dimuat
+    def warmup_in_background(self, names=None):
+        if not MODEL_WARMUP or self._warmup_thread is not None:
+            return
+        self._warmup_thread = threading.Thread(target=self.warmup, args=(names,), name="model-warmup", daemon=True)
+        self._warmup_thread.start()
+
+    def is_ready(self, names=None):
+        return all(self._status[name]["loaded"] for name in (self._loaders if names is None else names))
+
+    def status(self, names=None):
+        names = list(self._loaders) if names is None else names
+        ready = self.is_ready(names)
+        time_to_ready = None
+        if ready and names:
+            time_to_ready = round(max(self._status[name]["loaded_at"] for name in names) - PROCESS_START, 2)
+        return {
+            "ready": ready,
+            "uptime": round(time.time() - PROCESS_START, 2),
+            "time_to_ready": time_to_ready,
+            "models": {name: {k: v for k, v in self._status[name].items() if k != "loaded_at"} for name in names},
+        }
+
+# Loader SentenceTransformer dengan pilihan backend torch, ONNX, atau OpenVINO
+def load_sentence_transformer(device):
+    from sentence_transformers import SentenceTransformer
+    kwargs = {}
+    if EMBEDDING_BACKEND != "torch":
+        kwargs["backend"] = EMBEDDING_BACKEND
+        if EMBEDDING_MODEL_FILE:
+            kwargs["model_kwargs"] = {"file_name": EMBEDDING_MODEL_FILE}
+    model = SentenceTransformer(EMBEDDING_MODEL, device=device, **kwargs)
+    if EMBEDDING_BACKEND == "torch" and EMBEDDING_QUANTIZE and device == "cpu":
+        import torch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+registry = ModelRegistry()
+registry.register("embedding", load_sentence_transformer)
+
+# Fungsi untuk mendapatkan model embedding bersama
+def get_embedding_model():
+    return registry.get("embedding")
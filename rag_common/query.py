@@ -0,0 +1,91 @@
+from rag_common.collection_profiles import collection_profile, physical_collection, search_params
+from rag_common.metrics import span
+from rag_common.sparse import HYBRID_SEARCH, has_sparse_vectors, hybrid_query
+
+# Tahap query bersama: vektor query -> pencarian ke alias collection (hybrid BM25 + dense dengan RRF jika
+# collection punya sparse vector, selain itu hanya dense) -> daftar (teks, skor) -> prompt untuk LLM.
+# Versi sinkron dipakai service Qdrant, versi async dipakai service LLM; keduanya mengirim request yang sama.
+
+SYSTEM_PROMPT = "Jawablah pertanyaan berdasarkan informasi berikut. Jika tidak ada informasi yang relevan, katakan 'Saya tidak memiliki jawaban berdasarkan informasi yang tersedia', jangan mengarang jawaban dan memunculkan jawaban yang tidak relevan."
+
+# Konfigurasi collection di balik alias untuk pencarian: (punya sparse vector BM25, profil collection).
+# Hasilnya disimpan di sparse_support selama TTL-nya.
+def collection_search_config(client, collection_name, sparse_support, refresh=False):
+    config = None if refresh else sparse_support.get(collection_name)
+    if config is None:
+        physical = physical_collection(client, collection_name)
+        config = (has_sparse_vectors(client.get_collection(physical)), collection_profile(collection_name, physical))
+        sparse_support.set(collection_name, config)
+    return config
+
+async def async_collection_search_config(client, collection_name, sparse_support):
+    config = sparse_support.get(collection_name)
+    if config is None:
+        aliases = (await client.get_aliases()).aliases
+        physical = next((a.collection_name for a in aliases if a.alias_name == collection_name), collection_name)
+        config = (has_sparse_vectors(await client.get_collection(physical)),
+                  collection_profile(collection_name, physical))
+        sparse_support.set(collection_name, config)
+    return config
+
+# Memeriksa apakah collection di balik alias punya sparse vector BM25
+def collection_has_sparse(client, collection_name, sparse_support, refresh=False):
+    return collection_search_config(client, collection_name, sparse_support, refresh)[0]
+
+# Argumen query_points untuk satu pencarian; hanya payload teks dan skor yang diambil, vektor hasil tidak dipakai.
+# profile: profil collection yang dicari, menentukan ef HNSW dan rescoring kuantisasi
+def search_request(query, query_vector, limit, score_threshold=None, hybrid=False, profile=None):
+    if hybrid:
+        request = hybrid_query(query_vector, query, limit=limit, score_threshold=score_threshold,
+                               params=search_params(profile))
+    else:
+        request = {"query": list(query_vector), "limit": limit, "score_threshold": score_threshold,
+                   "search_params": search_params(profile)}
+    return dict(request, with_vectors=False, with_payload=["text"])
+
+def _hits(points):
+    return [(point.payload["text"], point.score) for point in points]
+
+# Pencarian sinkron; mengembalikan list (teks, skor) terurut menurut skor
+def search(client, collection_name, query, query_vector, limit, sparse_support, score_threshold=None):
+    with span("search"):
+        sparse, profile = collection_search_config(client, collection_name, sparse_support)
+        response = client.query_points(collection_name=collection_name,
+                                       **search_request(query, query_vector, limit, score_threshold,
+                                                        HYBRID_SEARCH and sparse, profile))
+    return _hits(response.points)
+
+async def async_search(client, collection_name, query, query_vector, limit, sparse_support, score_threshold=None):
+    with span("search"):
+        sparse, profile = await async_collection_search_config(client, collection_name, sparse_support)
+        response = await client.query_points(collection_name=collection_name,
+                                             **search_request(query, query_vector, limit, score_threshold,
+                                                              HYBRID_SEARCH and sparse, profile))
+    return _hits(response.points)
+
+# Pesan user untuk pertanyaan dengan konteks hasil pencarian
+def build_prompt(contexts, query):
+    context_text = " ".join(contexts)
+    return f"""
+    Anda adalah chatbot untuk seseorang bertanya mengenai informasi yang telah disediakan di Database Qdrant.
+    Teks informasi di bawah ini adalah hasil pencarian yang relevan dengan pertanyaan yang diajukan, namun mungkin tidak tersusun dengan baik.
+    Tugas Anda adalah menyusun ulang informasi ini secara koheren dan menjawab pertanyaan dengan lengkap dan jelas.
+    
+    {context_text}
+    
+    Setelah Anda membaca teks informasi tersebut, jawablah pertanyaan berikut dengan lengkap sesuai pertanyaannya:
+    Jika teks informasi yang diberikan tidak ada atau kosong, maka Anda jawab "Saya tidak memiliki jawaban berdasarkan informasi yang tersedia", jangan mengarang jawaban dan memunculkan jawaban yang tidak relevan.
+    Pertanyaan: {query}
+    
+    Jika Anda dapat menemukan jawaban berdasarkan teks informasi tersebut, berikan jawaban yang lengkap dengan susunan yang jelas dan koheren, tidak perlu menambahkan jawaban tambahan lainnya.
+    Jika Anda tidak dapat menemukan jawaban yang tepat, katakan bahwa "Saya tidak memiliki jawaban berdasarkan informasi yang tersedia", jangan mengarang jawaban dan memunculkan jawaban yang tidak relevan.
+    Jawablah sesuai dengan Bahasa yang digunakan di query.
+    """
+
+# Pesan user untuk pertanyaan lanjutan yang memakai teks informasi yang sudah ada di riwayat percakapan
+def build_followup_prompt(query):
+    return f"""
+    Pertanyaan lanjutan: {query}
+    Jawablah berdasarkan teks informasi pada pertanyaan sebelumnya. Jika jawabannya tidak ada di sana, katakan "Saya tidak memiliki jawaban berdasarkan informasi yang tersedia".
+    Jawablah sesuai dengan Bahasa yang digunakan di query.
+    """
@@ -0,0 +1,51 @@
+import os
+import httpx
+import numpy as np
+
+# Klien embedding jarak jauh: service yang tidak memuat model sendiri (mis. service LLM) mengirim query ke
+# endpoint /embed milik service Qdrant, yang meng-encode query dari semua service dalam satu micro-batcher dan
+# satu salinan model. Jika EMBEDDING_URL kosong, service memuat model di prosesnya sendiri seperti sebelumnya.
+EMBEDDING_URL = os.getenv("EMBEDDING_URL", "")  # mis. http://qdrant_api:8002/embed
+EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", "30"))  # Detik per request
+EMBEDDING_MAX_CONNECTIONS = int(os.getenv("EMBEDDING_MAX_CONNECTIONS", "32"))
+
+class RemoteEmbedder:
+    def __init__(self, url=EMBEDDING_URL, timeout=EMBEDDING_TIMEOUT, max_connections=EMBEDDING_MAX_CONNECTIONS):
+        self.url = url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client = None
+
+    # Klien dibuat saat pertama dipakai (di dalam event loop) dan dipakai ulang untuk semua request
+    def _get_client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                transport=httpx.AsyncHTTPTransport(retries=1),
+            )
+        return self._client
+
+    # Meng-encode daftar teks; urutan hasil sama dengan urutan masukan
+    async def encode(self, texts):
+        response = await self._get_client().post(self.url, json={"texts": list(texts)})
+        response.raise_for_status()
+        return [np.asarray(vector, dtype=np.float32) for vector in response.json()["vectors"]]
+
+    async def embed(self, text):
+        return (await self.encode([text]))[0]
+
+    # Status model di service embedding (isi /health service tersebut)
+    async def status(self):
+        health_url = self.url.rsplit("/", 1)[0] + "/health"
+        try:
+            response = await self._get_client().get(health_url, timeout=5)
+            return response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            return {"ready": False, "error": str(e)}
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
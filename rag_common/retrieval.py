@@ -0,0 +1,71 @@
+import os
+import re
+from rag_common.chunking import estimate_tokens
+
+# Tahap seleksi konteks setelah pencarian: hasil di bawah skor minimum sudah dibuang oleh Qdrant (score_threshold),
+# lalu hasil yang hampir sama dibuang dan sisanya didiversifikasi dengan MMR, kemudian dimasukkan ke prompt
+# sampai anggaran token habis. Kemiripan antar hasil dihitung dari kata (Jaccard) sehingga pencarian cukup
+# mengambil payload dan skor tanpa vektor.
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))  # Jumlah kandidat dari Qdrant
+RETRIEVAL_SCORE_THRESHOLD = float(os.getenv("RETRIEVAL_SCORE_THRESHOLD", "0.3"))  # Minimal cosine similarity
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))  # Maksimal konteks di prompt
+RETRIEVAL_MMR_LAMBDA = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.7"))  # 1.0: hanya relevansi, 0.0: hanya keragaman
+RETRIEVAL_DUPLICATE_THRESHOLD = float(os.getenv("RETRIEVAL_DUPLICATE_THRESHOLD", "0.8"))  # Jaccard dianggap duplikat
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))  # Perkiraan token konteks di prompt
+
+WORD_PATTERN = re.compile(r'\w+')
+
+def token_set(text):
+    return frozenset(WORD_PATTERN.findall(text.lower()))
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+# hits: list (teks, skor) terurut menurut skor. Mengembalikan paling banyak k hit hasil MMR, tanpa duplikat.
+# Skor dinormalisasi terhadap skor tertinggi agar skala cosine maupun skor RRF sebanding dengan Jaccard.
+def mmr(hits, k=RETRIEVAL_TOP_K, lambda_=RETRIEVAL_MMR_LAMBDA, duplicate_threshold=RETRIEVAL_DUPLICATE_THRESHOLD):
+    top_score = max((score for _, score in hits), default=0.0) or 1.0
+    candidates = [(text, score, token_set(text)) for text, score in hits]
+    selected = []
+    while candidates and len(selected) < k:
+        best_index, best_value, kept = None, None, []
+        for text, score, tokens in candidates:
+            redundancy = max((jaccard(tokens, s[2]) for s in selected), default=0.0)
+            if redundancy >= duplicate_threshold:
+                continue  # Hampir sama dengan konteks yang sudah dipilih
+            value = lambda_ * score / top_score - (1 - lambda_) * redundancy
+            if best_value is None or value > best_value:
+                best_index, best_value = len(kept), value
+            kept.append((text, score, tokens))
+        if best_index is None:
+            break
+        selected.append(kept.pop(best_index))
+        candidates = kept
+    return [(text, score) for text, score, _ in selected]
+
+# Memasukkan konteks berurutan sampai anggaran token habis; konteks pertama dipotong jika sendirian melebihi anggaran
+def pack_contexts(texts, budget=CONTEXT_TOKEN_BUDGET, count_tokens=estimate_tokens):
+    packed, used = [], 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if used + tokens <= budget:
+            packed.append(text)
+            used += tokens
+        elif not packed:
+            words, used = [], 0
+            for word in text.split():
+                word_tokens = count_tokens(word)
+                if used + word_tokens > budget:
+                    break
+                words.append(word)
+                used += word_tokens
+            packed.append(' '.join(words))
+            break
+    return packed, used
+
+# Dari hasil pencarian (teks, skor) ke daftar konteks akhir untuk prompt
+def select_contexts(hits, k=RETRIEVAL_TOP_K, budget=CONTEXT_TOKEN_BUDGET):
+    diversified = mmr(hits, k)
+    return pack_contexts([text for text, _ in diversified], budget)
@@ -0,0 +1,91 @@
+import os
+import re
+import time
+import zlib
+from collections import Counter
+from qdrant_client.http import models
+
+# Indeks leksikal BM25 memakai sparse vector Qdrant: bobot term (TF ala BM25) dihitung di sini saat indexing,
+# IDF dihitung oleh Qdrant (Modifier.IDF) sehingga tetap benar saat korpus berubah. Query mengambil kandidat
+# dense dan sparse lalu menggabungkannya dengan reciprocal rank fusion (RRF) di server.
+SPARSE_VECTOR_NAME = "bm25"
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+HYBRID_PREFETCH_LIMIT = int(os.getenv("HYBRID_PREFETCH_LIMIT", "20"))  # Kandidat per cabang sebelum fusion
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+BM25_AVG_LENGTH = float(os.getenv("BM25_AVG_LENGTH", "80"))  # Perkiraan rata-rata term per chunk
+SPARSE_CHECK_TTL = 60  # Detik hasil pengecekan konfigurasi collection disimpan
+
+WORD_PATTERN = re.compile(r'\w+')
+STOPWORDS = frozenset("""
+yang dan di ke dari untuk dengan pada dalam ini itu atau oleh adalah akan telah sebagai juga tidak
+bagi tersebut dapat karena serta the of and to in a is for
+""".split())
+
+# Term dokumen/query: kata (tanpa stopword) ditambah bigram kata berurutan, sehingga frasa seperti
+# "pasal 12" juga bisa dicocokkan persis
+def terms(text):
+    words = WORD_PATTERN.findall(text.lower())
+    unigrams = [word for word in words if word not in STOPWORDS]
+    bigrams = [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return unigrams + bigrams
+
+# Indeks term yang stabil antar proses dan antar versi Python (hash() bawaan diacak per proses)
+def term_index(term):
+    return zlib.crc32(term.encode("utf-8")) & 0x7FFFFFFF
+
+def _sparse_vector(weights):
+    indices = sorted(weights)
+    return models.SparseVector(indices=indices, values=[weights[i] for i in indices])
+
+def document_vector(text):
+    counts = Counter(term_index(term) for term in terms(text))
+    length = sum(counts.values())
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / BM25_AVG_LENGTH)
+    return _sparse_vector({index: tf * (BM25_K1 + 1) / (tf + norm) for index, tf in counts.items()})
+
+def query_vector(text):
+    return _sparse_vector({term_index(term): 1.0 for term in set(terms(text))})
+
+def sparse_vectors_config():
+    return {SPARSE_VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF)}
+
+# Memeriksa apakah collection punya sparse vector BM25 (collection lama hanya punya vektor dense)
+def has_sparse_vectors(collection_info):
+    return SPARSE_VECTOR_NAME in (collection_info.config.params.sparse_vectors or {})
+
+# Menyimpan hasil pengecekan collection (mis. sparse vector dan profil) per alias sebentar agar pencarian tidak
+# selalu membaca info collection
+class SparseSupportCache:
+    def __init__(self, ttl=SPARSE_CHECK_TTL):
+        self.ttl = ttl
+        self._values = {}
+
+    def get(self, collection_name):
+        checked = self._values.get(collection_name)
+        if checked is None or time.monotonic() - checked[0] > self.ttl:
+            return None
+        return checked[1]
+
+    def set(self, collection_name, value):
+        self._values[collection_name] = (time.monotonic(), value)
+
+# Vektor point: vektor dense (tanpa nama) ditambah sparse vector jika collection mendukungnya
+def point_vector(dense_vector, text, sparse):
+    if not sparse:
+        return dense_vector
+    return {"": list(dense_vector), SPARSE_VECTOR_NAME: document_vector(text)}
+
+# Argumen query_points untuk pencarian hybrid: kandidat dense (dengan skor minimum) dan BM25, digabung dengan RRF
+# params: SearchParams untuk cabang dense (ef HNSW, rescoring kuantisasi)
+def hybrid_query(dense_vector, text, limit, score_threshold=None, prefetch_limit=HYBRID_PREFETCH_LIMIT, params=None):
+    prefetch_limit = max(prefetch_limit, limit)
+    return {
+        "prefetch": [
+            models.Prefetch(query=list(dense_vector), limit=prefetch_limit, score_threshold=score_threshold,
+                            params=params),
+            models.Prefetch(query=query_vector(text), using=SPARSE_VECTOR_NAME, limit=prefetch_limit),
+        ],
+        "query": models.FusionQuery(fusion=models.Fusion.RRF),
+        "limit": limit,
+    }
@@ -0,0 +1,80 @@
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import qdrant_client
+from rag_common.metrics import span
+
+# Tahap upsert streaming ke Qdrant: point dikirim dalam batch berukuran tetap lewat satu koneksi
+# (gRPC jika tersedia) dengan jumlah request yang berjalan bersamaan dibatasi. Point berikutnya baru
+# diambil dari generator ketika ada slot kosong, sehingga memori ingest tetap datar berapa pun ukuran korpus.
+logger = logging.getLogger(__name__)
+
+QDRANT_URL = os.getenv("QDRANT_URL", "http://qdrant_db:6333")  # ":memory:" untuk collection sementara di proses ini
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "1") == "1"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "60"))  # Detik per request
+QDRANT_UPSERT_BATCH_SIZE = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "128"))
+QDRANT_UPSERT_PARALLEL = int(os.getenv("QDRANT_UPSERT_PARALLEL", "4"))  # Maksimal request upsert yang berjalan
+QDRANT_UPSERT_RETRIES = int(os.getenv("QDRANT_UPSERT_RETRIES", "3"))
+QDRANT_UPSERT_RETRY_DELAY = float(os.getenv("QDRANT_UPSERT_RETRY_DELAY", "1.0"))  # Detik, dilipatgandakan tiap retry
+
+# Membuat client Qdrant; client ini thread-safe dan memakai ulang koneksinya untuk semua batch
+def create_client(url=QDRANT_URL, prefer_grpc=QDRANT_PREFER_GRPC):
+    if url == ":memory:":
+        return qdrant_client.QdrantClient(":memory:")
+    return qdrant_client.QdrantClient(url, prefer_grpc=prefer_grpc, grpc_port=QDRANT_GRPC_PORT, timeout=QDRANT_TIMEOUT)
+
+# Membagi iterable menjadi list berukuran batch_size tanpa membaca seluruh iterable
+def iter_batches(items, batch_size):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, batch_size))
+        if not batch:
+            return
+        yield batch
+
+# Mengirim satu batch dengan retry dan backoff eksponensial
+def upsert_batch(client, collection_name, batch, retries=QDRANT_UPSERT_RETRIES, retry_delay=QDRANT_UPSERT_RETRY_DELAY):
+    for attempt in range(retries + 1):
+        try:
+            with span("upsert"):
+                client.upsert(collection_name=collection_name, points=batch, wait=True)
+            return len(batch)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = retry_delay * 2 ** attempt
+            logger.warning("Upsert %d point gagal (percobaan %d/%d): %s, ulangi dalam %.1f detik",
+                           len(batch), attempt + 1, retries + 1, e, delay)
+            time.sleep(delay)
+
+# Upsert point dari iterable (boleh generator) ke collection. progress(jumlah_point_terkirim) dipanggil
+# setiap kali satu batch selesai. Mengembalikan jumlah point yang di-upsert.
+def upsert_points(client, collection_name, points, batch_size=QDRANT_UPSERT_BATCH_SIZE,
+                  parallel=QDRANT_UPSERT_PARALLEL, progress=None):
+    upserted = 0
+    in_flight = deque()
+
+    def collect(future):
+        nonlocal upserted
+        upserted += future.result()
+        if progress is not None:
+            progress(upserted)
+
+    with ThreadPoolExecutor(max_workers=max(parallel, 1), thread_name_prefix="qdrant-upsert") as executor:
+        try:
+            for batch in iter_batches(points, batch_size):
+                # Backpressure: tunggu batch terlama selesai sebelum mengambil batch baru
+                while len(in_flight) >= max(parallel, 1):
+                    collect(in_flight.popleft())
+                in_flight.append(executor.submit(upsert_batch, client, collection_name, batch))
+            while in_flight:
+                collect(in_flight.popleft())
+        except BaseException:
+            for future in in_flight:
+                future.cancel()
+            raise
+    return upserted